@@ -22,6 +22,19 @@ class Player(Bot):
         Arguments:
         Nothing.
 
+        Returns:
+        Nothing.
+        '''
+        self.handle_new_game()
+
+    def handle_new_game(self):
+        '''
+        Called when the engine starts another game with this same process, and by __init__.
+        Forgets the opponent's hands and bids from the previous game.
+
+        Arguments:
+        Nothing.
+
         Returns:
         Nothing.
         '''
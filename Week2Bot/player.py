@@ -28,11 +28,6 @@ class Player(Bot):
         Returns:
         Nothing.
         '''
-        self.activate_folds = False
-
-        self.opp_holes = []
-        self.opp_bids = []
-
         prev_time = time.time()
         with open("hand_strengths", "rb") as file:
             self.starting_strengths = pickle.load(file)
@@ -47,6 +42,24 @@ class Player(Bot):
 
         self.rank_to_numeric = rank_to_numeric
 
+        self.handle_new_game()
+
+    def handle_new_game(self):
+        '''
+        Called when the engine starts another game with this same process, and by __init__.
+        Forgets everything learned about the opponent. The tables loaded in __init__ are kept.
+
+        Arguments:
+        Nothing.
+
+        Returns:
+        Nothing.
+        '''
+        self.activate_folds = False
+
+        self.opp_holes = []
+        self.opp_bids = []
+
         self.num_showdowns = 0
         self.opp_avg_strength = 0.5
 
@@ -1,6 +1,103 @@
 '''
 This file contains the base class that you should implement for your pokerbot.
 '''
+import time
+from .states import NUM_ROUNDS
+
+# streets every round is expected to have a decision on, before any are measured
+STREETS = [0, 'auction', 3, 4, 5]
+
+
+class TimeBudget():
+    '''
+    Splits the game clock between the decisions left in the game.
+
+    The Runner times every get_action, keyed by street with the auction as its own key.
+    Each decision's budget is its share of the clock left per round, in proportion to what
+    decisions on its street have cost so far, so a bot that thinks harder on the river keeps
+    doing so. reserve seconds of the clock are kept back, and only a safety fraction of the
+    rest is handed out, for the time the engine charges outside of get_action.
+    '''
+
+    def __init__(self, reserve=1., safety=0.8):
+        self.reserve = reserve
+        self.safety = safety
+        self.costs = {}  # key -> [total seconds, decisions]
+        self.total = 0.
+        self.decisions = 0
+        self.rounds = 0
+        self.round_num = None
+        self.key = None
+        self.started = None
+        self.deadline = None
+
+    def street_key(self, round_state):
+        return 'auction' if round_state.auction else round_state.street
+
+    def budget(self, game_state, key):
+        '''
+        Returns the seconds a decision on street key may take.
+        '''
+        spare = max(0., game_state.game_clock - self.reserve) * self.safety
+        rounds_left = NUM_ROUNDS - game_state.round_num + 1
+        if rounds_left < 1:
+            # the match is longer than NUM_ROUNDS, so how long is unknown: hand out a fixed
+            # share of what is left each round rather than all of it
+            rounds_left = NUM_ROUNDS
+        round_share = spare / rounds_left
+        # a round costs what the decisions of every street have cost, per round
+        round_cost = self.total / self.rounds if self.rounds else 0.
+        if round_cost <= 0.:
+            return round_share / len(STREETS)
+        cost = self.costs.get(key)
+        mean = cost[0] / cost[1] if cost else self.total / self.decisions
+        return round_share * min(1., mean / round_cost)
+
+    def start(self, game_state, round_state):
+        '''
+        Called by the Runner before get_action: sets the deadline of this decision.
+        '''
+        if game_state.round_num != self.round_num:
+            self.round_num = game_state.round_num
+            self.rounds += 1
+        self.key = self.street_key(round_state)
+        self.started = time.perf_counter()
+        self.deadline = self.started + self.budget(game_state, self.key)
+
+    def finish(self):
+        '''
+        Called by the Runner after get_action: records what the decision cost.
+        '''
+        seconds = time.perf_counter() - self.started
+        cost = self.costs.setdefault(self.key, [0., 0])
+        cost[0] += seconds
+        cost[1] += 1
+        self.total += seconds
+        self.decisions += 1
+        self.deadline = None
+
+    def anytime(self, step, min_steps=1, max_steps=None, fraction=1.):
+        '''
+        Runs an anytime computation: calls step, which refines an estimate and returns it,
+        until this decision's deadline and returns the last estimate. Calls step at least
+        min_steps times even when there is no time left, and at most max_steps times.
+        fraction is the share of the time left that this computation may use, for decisions
+        that run several. Outside of a decision, step runs min_steps times.
+
+        Keep steps short, such as a batch of Monte Carlo samples: the deadline is checked
+        between steps.
+        '''
+        deadline = self.deadline
+        if deadline is not None:
+            now = time.perf_counter()
+            deadline = now + (deadline - now) * fraction
+        estimate = None
+        steps = 0
+        while steps < min_steps or (deadline is not None and time.perf_counter() < deadline
+                                    and (max_steps is None or steps < max_steps)):
+            estimate = step()
+            steps += 1
+        return estimate
 
 
 class Bot():
@@ -8,6 +105,22 @@ class Bot():
     The base class for a pokerbot.
     '''
 
+    # set by the Runner unless the pokerbot sets its own, see TimeBudget.anytime
+    time_budget = None
+
+    def handle_new_game(self):
+        '''
+        Called when the engine starts another game with this same process,
+        before the first round of that game. Reset any per-game state here.
+
+        Arguments:
+        Nothing.
+
+        Returns:
+        Nothing.
+        '''
+        pass
+
     def handle_new_round(self, game_state, round_state, active):
         '''
         Called when a new round starts. Called NUM_ROUNDS times.
@@ -59,3 +172,25 @@ class Bot():
             return CheckAction()
         else:
             return FoldAction()
+
+    def ponder(self, game_state, round_state, active, stop):
+        '''
+        Optional. Called on a background thread after each response, while the engine waits
+        on the opponent. Use it for speculative work, such as equity for your hole cards or
+        auction values, and keep the results on self for get_action to read. The game clock
+        is not charged while you ponder, in wall or CPU time, but the time ponder takes to
+        return once stop is set is part of your next response.
+
+        Check stop.is_set() often and return soon after it is set: the next message from
+        the engine sets it and waits for ponder to return before it is handled.
+
+        Arguments:
+        game_state: the GameState object.
+        round_state: the RoundState object you last acted on, or None between rounds.
+        active: your player's index.
+        stop: a threading.Event that is set when the engine's next message arrives.
+
+        Returns:
+        Nothing.
+        '''
+        pass
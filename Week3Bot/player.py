@@ -6,6 +6,7 @@ from skeleton.states import GameState, TerminalState, RoundState
 from skeleton.states import NUM_ROUNDS, STARTING_STACK, BIG_BLIND, SMALL_BLIND
 from skeleton.bot import Bot
 from skeleton.runner import parse_args, run_bot
+from skeleton.log import log
 import random
 import eval7
 import pickle
@@ -28,11 +29,6 @@ class Player(Bot):
         Returns:
         Nothing.
         '''
-        self.activate_folds = False
-
-        self.opp_holes = []
-        self.opp_bids = []
-
         prev_time = time.time()
         with open("hand_strengths", "rb") as file:
             self.starting_strengths = pickle.load(file)
@@ -47,6 +43,24 @@ class Player(Bot):
 
         self.rank_to_numeric = rank_to_numeric
 
+        self.handle_new_game()
+
+    def handle_new_game(self):
+        '''
+        Called when the engine starts another game with this same process, and by __init__.
+        Forgets everything learned about the opponent. The tables loaded in __init__ are kept.
+
+        Arguments:
+        Nothing.
+
+        Returns:
+        Nothing.
+        '''
+        self.activate_folds = False
+
+        self.opp_holes = []
+        self.opp_bids = []
+
         self.num_showdowns = 0
         self.opp_avg_strength = 0.5
 
@@ -91,10 +105,10 @@ class Player(Bot):
 
 
         if self.activate_folds == True:
-            print(self.activate_folds, "Round num: ", round_num)
+            log.info(self.activate_folds, "Round num: ", round_num)
 
         if num_rounds == NUM_ROUNDS:
-            print(game_clock)
+            log.info(game_clock)
 
 
     def hand_to_strength(self, my_cards): #AcKs, Jc9s
@@ -148,12 +162,12 @@ class Player(Bot):
             self.reformattedoppcardswitheval7.append(ReformattedOppCards)
 
             if len(self.alloppcards) >= 20:     #if more than 20 showdowns have occured
-                print(self.Last_20_Opp_Cards[0])
+                log.debug(self.Last_20_Opp_Cards[0])
                 self.Last_20_Opp_Cards.pop(0)    #update to only include the last 20
                 self.Last_20_Opp_Cards.append(opp_cards)
             else:
                 self.Last_20_Opp_Cards.append(opp_cards) #if less than 20 occur we add to the list
-                print(type(self.Last_20_Opp_Cards))
+                log.debug(type(self.Last_20_Opp_Cards))
 
             opp_cur_strength = self.hand_to_strength(opp_cards[:2])
             opp_cur_strength = (opp_cur_strength[0] + opp_cur_strength[1])/2
@@ -170,7 +184,7 @@ class Player(Bot):
             self.num_showdowns += 1
             # self.opp_holes.append(opp_cards[:2])
             self.opp_bids.append(opp_bid)
-            print(self.Last_20_Opp_Cards)
+            log.debug(self.Last_20_Opp_Cards)
 
 
 
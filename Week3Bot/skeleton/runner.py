@@ -3,10 +3,162 @@ The infrastructure for interacting with the engine.
 '''
 import argparse
 import socket
+import struct
+import threading
 from .actions import FoldAction, CallAction, CheckAction, RaiseAction, BidAction
 from .states import GameState, TerminalState, RoundState
 from .states import STARTING_STACK, BIG_BLIND, SMALL_BLIND
-from .bot import Bot
+from .bot import Bot, TimeBudget
+from .log import log
+
+# Binary wire protocol, offered by the engine with a 'V1' text message:
+#
+# engine messages are a uint16 payload length followed by clauses, each a tag byte
+# (the text clause letter) and fixed-width little-endian fields:
+# T float64, P uint8, R/A/D int32, N four int32 (stacks, bids) and cards,
+# H/B/O cards, F/C/K/G/Q nothing, where cards are a uint8 count and uint8 ids
+# pokerbot responses are a tag byte and an int32 amount
+WIRE_VERSION = 'V1'
+CARD_NAMES = [rank + suit for rank in '23456789TJQKA' for suit in 'cdhs']
+FRAME = struct.Struct('<H')
+DOUBLE = struct.Struct('<d')
+INT = struct.Struct('<i')
+STACKS_AND_BIDS = struct.Struct('<4i')
+RESPONSE = struct.Struct('<Bi')
+ACTION_CODES = {FoldAction: 'F', CallAction: 'C', CheckAction: 'K', BidAction: 'A', RaiseAction: 'R'}
+
+
+def parse_cards(value):
+    return value.split(',')
+
+
+def parse_stacks_and_bids(value):
+    stacks, bids, active_hands = value.split('_')
+    return [int(x) for x in stacks.split(',')], [int(x) for x in bids.split(',')], active_hands.split(',')
+
+
+# decoders of text clause values by clause type, other clauses keep their text
+TEXT_DECODERS = {'T': float, 'P': int, 'R': int, 'A': int, 'D': int,
+                 'H': parse_cards, 'B': parse_cards, 'O': parse_cards, 'N': parse_stacks_and_bids}
+
+
+class RoundMirror():
+    '''
+    The current round, updated in place as the engine reports actions. It follows the rules
+    of RoundState.proceed without building a state per action, and view() builds a RoundState
+    only when the pokerbot is called.
+    '''
+    __slots__ = ['button', 'street', 'auction', 'bids', 'pips', 'stacks', 'hands', 'deck', 'terminal']
+
+    def __init__(self):
+        self.start(0, [])
+
+    def start(self, active, hand):
+        '''
+        Deals a new round, in which we only know our own hand.
+        '''
+        self.button = 0
+        self.street = 0
+        self.auction = False
+        self.bids = [None, None]
+        self.pips = [SMALL_BLIND, BIG_BLIND]
+        self.stacks = [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND]
+        self.hands = [[], []]
+        self.hands[active] = hand
+        self.deck = []
+        self.terminal = False
+
+    def view(self):
+        '''
+        Returns a RoundState of the round as it is now. It has no previous_state, and its lists
+        are copies, so the pokerbot may keep or modify it.
+        '''
+        return RoundState(self.button, self.street, self.auction, list(self.bids), list(self.pips),
+                          list(self.stacks), [list(hand) for hand in self.hands], list(self.deck), None)
+
+    def proceed_street(self):
+        if self.street == 5:
+            self.terminal = True  # showdown
+            return
+        self.auction = self.street == 0
+        self.street = 3 if self.street == 0 else self.street + 1
+        self.button = 1
+        self.pips = [0, 0]
+
+    def fold(self, _):
+        self.terminal = True
+
+    def call(self, _):
+        if self.button == 0:  # sb calls bb
+            self.button = 1
+            self.pips = [BIG_BLIND, BIG_BLIND]
+            self.stacks = [STARTING_STACK - BIG_BLIND, STARTING_STACK - BIG_BLIND]
+            return
+        # both players acted
+        active = self.button % 2
+        contribution = self.pips[1-active] - self.pips[active]
+        self.stacks[active] -= contribution
+        self.pips[active] += contribution
+        self.button += 1
+        self.proceed_street()
+
+    def check(self, _):
+        if (self.street == 0 and self.button > 0) or self.button > 1:  # both players acted
+            self.proceed_street()
+        else:
+            self.button += 1
+
+    def raise_to(self, amount):
+        active = self.button % 2
+        contribution = amount - self.pips[active]
+        self.stacks[active] -= contribution
+        self.pips[active] += contribution
+        self.button += 1
+
+    def bid(self, amount):
+        self.bids[self.button % 2] = amount
+        if None in self.bids:
+            self.button += 1
+            return
+        # both players have submitted bids, a tie charges both of them
+        if self.bids[0] == self.bids[1]:
+            self.stacks[0] -= self.bids[0]
+            self.stacks[1] -= self.bids[1]
+        else:
+            winner = self.bids.index(max(self.bids))
+            self.stacks[winner] -= self.bids[1 - winner]
+        self.button = 1
+        self.auction = False
+
+    def set_board(self, cards):
+        self.deck = cards
+
+
+class Ponderer():
+    '''
+    Runs the pokerbot's ponder hook on a background thread while the engine waits on the opponent.
+    '''
+
+    def __init__(self, pokerbot):
+        self.pokerbot = pokerbot
+        self.thread = None
+        self.stop_event = None
+
+    def start(self, game_state, round_state, active):
+        # every run gets its own event, so it cannot miss its stop
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.pokerbot.ponder, args=(game_state, round_state, active, self.stop_event), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        '''
+        Asks the running ponder to return and waits for it, so the pokerbot's state is not
+        changed by both threads at once.
+        '''
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
 
 
 class Runner():
@@ -17,107 +169,235 @@ class Runner():
     def __init__(self, pokerbot, socketfile):
         self.pokerbot = pokerbot
         self.socketfile = socketfile
+        self.binary = False
+        self.bankroll = 0
+        self.game_clock = 0.
+        self.round_num = 1
+        self.round = RoundMirror()
+        self.active = 0
+        self.round_flag = True
+        # only pokerbots that override ponder pay for the background thread
+        self.ponderer = Ponderer(pokerbot) if type(pokerbot).ponder is not Bot.ponder else None
+        if pokerbot.time_budget is None:
+            pokerbot.time_budget = TimeBudget()
+        self.time_budget = pokerbot.time_budget
+        self.handlers = {
+            'T': self.set_game_clock,
+            'G': self.new_game,
+            'P': self.set_active,
+            'H': self.new_round,
+            'F': self.round.fold,
+            'C': self.round.call,
+            'K': self.round.check,
+            'R': self.round.raise_to,
+            'A': self.round.bid,
+            'N': self.auction_result,
+            'B': self.round.set_board,
+            'O': self.reveal,
+            'D': self.end_round,
+        }
+        # text clauses are decoded and applied in one lookup
+        self.text_handlers = {clause: (TEXT_DECODERS.get(clause, str), handler) for clause, handler in self.handlers.items()}
 
     def receive(self):
         '''
-        Generator for incoming messages from the engine.
+        Generator for incoming messages from the engine, each with the method that handles it.
+        Stops when the engine closes the connection.
         '''
         while True:
-            packet = self.socketfile.readline().strip().split(' ')
-            if not packet:
-                break
-            yield packet
+            if self.binary:
+                header = self.socketfile.read(FRAME.size)
+                if len(header) < FRAME.size:
+                    break
+                yield self.handle_packet, self.parse_binary(self.socketfile.read(FRAME.unpack(header)[0]))
+            else:
+                line = self.socketfile.readline()
+                if not line:
+                    break
+                yield self.handle_text, line.strip().split(' ')
+
+    def parse_text(self, packet):
+        '''
+        Decodes the clauses of a text message into (type, value) pairs.
+        '''
+        return [(clause[0], TEXT_DECODERS.get(clause[0], str)(clause[1:])) for clause in packet]
+
+    def parse_binary(self, payload):
+        '''
+        Decodes the clauses of a binary message into (type, value) pairs.
+        '''
+        clauses = []
+        offset = 0
+        while offset < len(payload):
+            clause = chr(payload[offset])
+            offset += 1
+            if clause == 'T':
+                value = DOUBLE.unpack_from(payload, offset)[0]
+                offset += DOUBLE.size
+            elif clause == 'P':
+                value = payload[offset]
+                offset += 1
+            elif clause in 'RAD':
+                value = INT.unpack_from(payload, offset)[0]
+                offset += INT.size
+            elif clause in 'HBON':
+                if clause == 'N':
+                    stacks_and_bids = STACKS_AND_BIDS.unpack_from(payload, offset)
+                    offset += STACKS_AND_BIDS.size
+                count = payload[offset]
+                cards = [CARD_NAMES[card] for card in payload[offset + 1:offset + 1 + count]]
+                offset += 1 + count
+                value = (list(stacks_and_bids[:2]), list(stacks_and_bids[2:]), cards) if clause == 'N' else cards
+            else:
+                value = None
+            clauses.append((clause, value))
+        return clauses
+
+    def negotiate(self, version):
+        '''
+        Accepts the engine's offer of the binary protocol.
+        '''
+        if version != WIRE_VERSION[1:]:
+            return False
+        self.socketfile.write(WIRE_VERSION + '\n')
+        self.socketfile.flush()
+        # the engine sends nothing until it reads our reply, so no text is left buffered
+        self.socketfile = self.socketfile.detach()
+        self.binary = True
+        return True
 
     def send(self, action):
         '''
         Encodes an action and sends it to the engine.
         '''
-        if isinstance(action, FoldAction):
-            code = 'F'
-        elif isinstance(action, CallAction):
-            code = 'C'
-        elif isinstance(action, CheckAction):
-            code = 'K'
-        elif isinstance(action, BidAction): 
-            code = 'A' + str(action.amount)
-        else:  # isinstance(action, RaiseAction)
-            code = 'R' + str(action.amount)
-        self.socketfile.write(code + '\n')
+        code = ACTION_CODES.get(type(action), 'R')
+        amount = action.amount if code in 'RA' else 0
+        if self.binary:
+            self.socketfile.write(RESPONSE.pack(ord(code), amount))
+        else:
+            self.socketfile.write(code + (str(amount) if code in 'RA' else '') + '\n')
         self.socketfile.flush()
 
+    def game_state(self):
+        return GameState(self.bankroll, self.game_clock, self.round_num)
+
+    def set_game_clock(self, game_clock):
+        self.game_clock = game_clock
+
+    def new_game(self, _):
+        # the engine reuses this process for another game
+        self.bankroll = 0
+        self.round_num = 1
+        self.round_flag = True
+        self.pokerbot.handle_new_game()
+
+    def set_active(self, active):
+        self.active = active
+
+    def new_round(self, hand):
+        self.round.start(self.active, hand)
+        if self.round_flag:
+            self.pokerbot.handle_new_round(self.game_state(), self.round.view(), self.active)
+            self.round_flag = False
+
+    def auction_result(self, value):
+        self.round.stacks, self.round.bids, hand = value
+        self.round.hands = [[], []]
+        self.round.hands[self.active] = hand
+        self.round.deck = []
+
+    def reveal(self, hand):
+        # the opponent's hand at showdown
+        self.round.hands[1-self.active] = hand
+
+    def end_round(self, delta):
+        assert self.round.terminal
+        deltas = [-delta, -delta]
+        deltas[self.active] = delta
+        previous_state = self.round.view()
+        terminal_state = TerminalState(deltas, previous_state.bids, previous_state)
+        self.bankroll += delta
+        self.pokerbot.handle_round_over(self.game_state(), terminal_state, self.active)
+        self.round_num += 1
+        self.round_flag = True
+        log.flush_soon()
+
+    def handle_packet(self, packet):
+        '''
+        Applies one decoded message to the game and round mirrors and sends the pokerbot's response.
+        Returns False once the engine signals that the game is over.
+        '''
+        if self.ponderer is not None:
+            self.ponderer.stop()
+        handlers = self.handlers
+        for clause, value in packet:
+            handler = handlers.get(clause)
+            if handler is not None:
+                handler(value)
+            elif clause == 'V' and self.negotiate(value):
+                return True
+            elif clause == 'Q':
+                self.close()
+                return False
+        self.respond()
+        return True
+
+    def handle_text(self, packet):
+        '''
+        Does what handle_packet(parse_text(packet)) does, decoding each clause as it is applied.
+        '''
+        if self.ponderer is not None:
+            self.ponderer.stop()
+        text_handlers = self.text_handlers
+        for clause in packet:
+            handler = text_handlers.get(clause[0])
+            if handler is not None:
+                handler[1](handler[0](clause[1:]))
+            elif clause[0] == 'V' and self.negotiate(clause[1:]):
+                return True
+            elif clause[0] == 'Q':
+                self.close()
+                return False
+        self.respond()
+        return True
+
+    def respond(self):
+        '''
+        Sends the pokerbot's action, or an acknowledgement between rounds, then starts
+        pondering until the next message.
+        '''
+        if self.round_flag:  # ack the engine
+            round_state = None
+            self.send(CheckAction())
+        else:
+            assert self.active == self.round.button % 2
+            round_state = self.round.view()
+            game_state = self.game_state()
+            self.time_budget.start(game_state, round_state)
+            action = self.pokerbot.get_action(game_state, round_state, self.active)
+            self.time_budget.finish()
+            self.send(action)
+        if self.ponderer is not None:
+            self.ponderer.start(self.game_state(), round_state, self.active)
+
     def run(self):
         '''
-        Reconstructs the game tree based on the action history received from the engine.
-        '''
-        game_state = GameState(0, 0., 1)
-        round_state = None
-        active = 0
-        round_flag = True
-        for packet in self.receive():
-            # print(packet)
-            for clause in packet:
-                if clause[0] == 'T':
-                    game_state = GameState(game_state.bankroll, float(clause[1:]), game_state.round_num)
-                elif clause[0] == 'P':
-                    active = int(clause[1:])
-                elif clause[0] == 'H':
-                    hands = [[], []]
-                    hands[active] = clause[1:].split(',')
-                    pips = [SMALL_BLIND, BIG_BLIND]
-                    stacks = [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND]
-                    round_state = RoundState(0, 0, False, [None, None], pips, stacks, hands, [], None)
-                    if round_flag:
-                        self.pokerbot.handle_new_round(game_state, round_state, active)
-                        round_flag = False
-                elif clause[0] == 'F':
-                    round_state = round_state.proceed(FoldAction())
-                elif clause[0] == 'C':
-                    round_state = round_state.proceed(CallAction())
-                elif clause[0] == 'K':
-                    round_state = round_state.proceed(CheckAction())
-                elif clause[0] == 'R':
-                    round_state = round_state.proceed(RaiseAction(int(clause[1:])))
-                elif clause[0] == 'A': 
-                    round_state = round_state.proceed(BidAction(int(clause[1:])))
-                elif clause[0] == 'N':
-                    hands = [[], []]
-                    stacks, bids, active_hands = clause[1:].split('_')
-                    bids = bids.split(',')
-                    stacks = stacks.split(',')
-                    hands[active] = active_hands.split(',')
-                    round_state = RoundState(round_state.button, round_state.street, round_state.auction, [int(x) for x in bids], round_state.pips, [int(x) for x in stacks], hands, [], round_state)
-                elif clause[0] == 'B':
-                    round_state = RoundState(round_state.button, round_state.street, round_state.auction, round_state.bids, 
-                                            round_state.pips, round_state.stacks, round_state.hands, clause[1:].split(','), 
-                                            round_state.previous_state)
-                elif clause[0] == 'O':
-                    # backtrack
-                    round_state = round_state.previous_state
-                    revised_hands = list(round_state.hands)
-                    revised_hands[1-active] = clause[1:].split(',')
-                    # rebuild history
-                    round_state = RoundState(round_state.button, round_state.street, round_state.auction, round_state.bids, 
-                                            round_state.pips, round_state.stacks, revised_hands, round_state.deck, 
-                                            round_state.previous_state)
-                    round_state = TerminalState([0, 0], round_state.bids, round_state)
-                elif clause[0] == 'D':
-                    assert isinstance(round_state, TerminalState)
-                    delta = int(clause[1:])
-                    deltas = [-delta, -delta]
-                    deltas[active] = delta
-                    round_state = TerminalState(deltas, round_state.bids, round_state.previous_state)
-                    game_state = GameState(game_state.bankroll + delta, game_state.game_clock, game_state.round_num)
-                    self.pokerbot.handle_round_over(game_state, round_state, active)
-                    game_state = GameState(game_state.bankroll, game_state.game_clock, game_state.round_num + 1)
-                    round_flag = True
-                elif clause[0] == 'Q':
+        Processes messages from the engine until the game is over or the connection closes.
+        '''
+        try:
+            for handle, packet in self.receive():
+                if not handle(packet):
                     return
-            if round_flag:  # ack the engine
-                self.send(CheckAction())
-            else:
-                assert active == round_state.button % 2
-                action = self.pokerbot.get_action(game_state, round_state, active)
-                self.send(action)
+        finally:
+            self.close()
+
+    def close(self):
+        '''
+        Stops pondering and the log's background thread, and writes what is left in the log.
+        '''
+        if self.ponderer is not None:
+            self.ponderer.stop()
+        log.close()
 
 
 def parse_args():
@@ -126,7 +406,9 @@ def parse_args():
     '''
     parser = argparse.ArgumentParser(prog='python3 player.py')
     parser.add_argument('--host', type=str, default='localhost', help='Host to connect to, defaults to localhost')
-    parser.add_argument('port', type=int, help='Port on host to connect to')
+    parser.add_argument('--unix', type=str, default=None, help='Unix domain socket to connect to instead of a port')
+    parser.add_argument('--fd', type=int, default=None, help='Inherited connected socket to use instead of a port')
+    parser.add_argument('port', type=int, nargs='?', help='Port on host to connect to')
     return parser.parse_args()
 
 def run_bot(pokerbot, args):
@@ -135,12 +417,18 @@ def run_bot(pokerbot, args):
     '''
     assert isinstance(pokerbot, Bot)
     try:
-        sock = socket.create_connection((args.host, args.port))
+        if args.fd is not None:
+            sock = socket.socket(fileno=args.fd)
+        elif args.unix is not None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(args.unix)
+        else:
+            sock = socket.create_connection((args.host, args.port))
     except OSError:
-        print('Could not connect to {}:{}'.format(args.host, args.port))
+        print('Could not connect to {}'.format(args.unix or args.fd or '{}:{}'.format(args.host, args.port)))
         return
     socketfile = sock.makefile('rw')
     runner = Runner(pokerbot, socketfile)
     runner.run()
-    socketfile.close()
+    runner.socketfile.close()
     sock.close()
@@ -0,0 +1,133 @@
+'''
+Buffered logging for pokerbots.
+
+print() costs a write to the engine's pipe per call, and blocks the pokerbot when the
+pipe is full. The log keeps formatted lines in a ring buffer in memory instead, and a
+background thread writes them out in one go after every round and every interval seconds.
+When the buffer is full the oldest lines are dropped, so logging never blocks.
+'''
+from collections import deque
+import threading
+import atexit
+import sys
+import os
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+OFF = 100
+LEVELS = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'off': OFF}
+# overrides the level a pokerbot asks for, so matches can quiet pokerbots without editing them
+LEVEL_VARIABLE = 'POKERBOT_LOG_LEVEL'
+
+
+def discard(*values):
+    pass
+
+
+class Log():
+    '''
+    Usage: log.debug('Flop strength:', strength), with arguments joined as print() joins them.
+    Calls below the level are a no-op that formats nothing.
+    '''
+
+    def __init__(self, level=DEBUG, capacity=4096, interval=0.5, stream=None):
+        self.lines = deque(maxlen=capacity)
+        self.dropped = 0
+        self.interval = interval
+        # where output goes is fixed when the log is made, pokerbots in the engine process
+        # are imported with their own log as stdout
+        self.stream = stream or sys.stdout
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+        self.stopped = False
+        self.set_level(LEVELS.get(os.environ.get(LEVEL_VARIABLE, '').lower(), level))
+
+    def set_level(self, level):
+        '''
+        Logs calls at level and above, and turns the methods below it into no-ops.
+        '''
+        self.level = level
+        for name, value in (('debug', DEBUG), ('info', INFO), ('warning', WARNING)):
+            if value < level:
+                setattr(self, name, discard)
+            else:
+                self.__dict__.pop(name, None)
+
+    def enabled(self, level):
+        '''
+        Returns whether calls at level are logged, to skip building expensive messages.
+        '''
+        return level >= self.level
+
+    def debug(self, *values):
+        self.append(values)
+
+    def info(self, *values):
+        self.append(values)
+
+    def warning(self, *values):
+        self.append(values)
+
+    def append(self, values):
+        # lines are formatted now, since the values may change before they are written
+        if len(self.lines) == self.lines.maxlen:
+            self.dropped += 1
+        self.lines.append(' '.join(map(str, values)))
+        if self.thread is None:
+            self.start()
+
+    def start(self):
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def run(self):
+        while not self.stopped:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            self.flush()
+
+    def close(self):
+        '''
+        Stops the background thread and writes the buffered lines. Logging again restarts it.
+        '''
+        if self.thread is not None:
+            self.stopped = True
+            self.wake.set()
+            self.thread.join()
+            self.thread = None
+            atexit.unregister(self.flush)
+        self.flush()
+
+    def flush_soon(self):
+        '''
+        Asks the background thread to write the buffered lines without waiting for it.
+        '''
+        if self.thread is not None:
+            self.wake.set()
+
+    def flush(self):
+        '''
+        Writes the buffered lines now.
+        '''
+        with self.lock:
+            lines = []
+            while self.lines:
+                lines.append(self.lines.popleft())
+            if self.dropped:
+                lines.append('[{} log lines dropped]'.format(self.dropped))
+                self.dropped = 0
+            if lines:
+                try:
+                    self.stream.write('\n'.join(lines) + '\n')
+                    self.stream.flush()
+                except (OSError, ValueError):
+                    # the engine has closed our output
+                    pass
+
+
+# the log pokerbots share with the Runner, which flushes it after every round
+log = Log()
@@ -51,6 +51,12 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'auction', 'bids
         min_contribution = min(max_contribution, continue_cost + max(continue_cost, BIG_BLIND))
         return (self.pips[active] + min_contribution, self.pips[active] + max_contribution)
 
+    def bid_bounds(self):
+        '''
+        Returns a tuple of the minimum and maximum legal bid amounts.
+        '''
+        return (0, self.stacks[self.button % 2])
+
     def proceed_street(self):
         '''
         Resets the players' pips and advances the game tree to the next round of betting.
@@ -94,7 +100,6 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'auction', 'bids
                     new_stacks = list(self.stacks)
                     new_stacks[0] -= self.bids[0]
                     new_stacks[1] -= self.bids[1]
-                    print(new_stacks)
                     state = RoundState(1, self.street, False, self.bids, self.pips, new_stacks, self.hands, self.deck, self)
                 else:
                 # case in which bids are not equal
@@ -6,6 +6,7 @@ from skeleton.states import GameState, TerminalState, RoundState
 from skeleton.states import NUM_ROUNDS, STARTING_STACK, BIG_BLIND, SMALL_BLIND
 from skeleton.bot import Bot
 from skeleton.runner import parse_args, run_bot
+from skeleton.log import log
 import random
 import eval7
 import pickle
@@ -28,13 +29,6 @@ class Player(Bot):
         Returns:
         Nothing.
         '''
-        self.activate_folds = False
-
-        self.opp_holes = []
-        self.opp_bids = []
-        self.min_opp_bid = 0
-        self.max_opp_bid = 0
-
         prev_time = time.time()
         with open("hand_strengths", "rb") as file:
             self.starting_strengths = pickle.load(file)
@@ -49,6 +43,26 @@ class Player(Bot):
 
         self.rank_to_numeric = rank_to_numeric
 
+        self.handle_new_game()
+
+    def handle_new_game(self):
+        '''
+        Called when the engine starts another game with this same process, and by __init__.
+        Forgets everything learned about the opponent. The tables loaded in __init__ are kept.
+
+        Arguments:
+        Nothing.
+
+        Returns:
+        Nothing.
+        '''
+        self.activate_folds = False
+
+        self.opp_holes = []
+        self.opp_bids = []
+        self.min_opp_bid = 0
+        self.max_opp_bid = 0
+
         self.num_showdowns = 0
         self.opp_avg_strength = 0.5
 
@@ -86,7 +100,7 @@ class Player(Bot):
         # if my_bankroll > forever_fold:
         #     self.activate_folds = True
 
-        print("--------Round", round_num, "-------------")
+        log.debug("--------Round", round_num, "-------------")
 
         self.early_game = (round_num < 100)
 
@@ -94,10 +108,10 @@ class Player(Bot):
         self.card_strength = (card_strength[0] + card_strength[1])/2
 
         if self.activate_folds == True:
-            print(self.activate_folds, "Round num: ", round_num)
+            log.info(self.activate_folds, "Round num: ", round_num)
 
         if num_rounds == NUM_ROUNDS:
-            print(game_clock)
+            log.info(game_clock)
 
 
     def hand_to_strength(self, my_cards): #AcKs, Jc9s
@@ -234,7 +248,7 @@ class Player(Bot):
 
 
 
-        def calculate_ShouldWeBidOnTheAuction(mycards, flopcards, iters):
+        def calculate_ShouldWeBidOnTheAuction(mycards, flopcards, batch):
             #this one will determine if we want to bid on auction
             #this is post flop so take that into account
             deck = eval7.Deck()
@@ -248,63 +262,72 @@ class Player(Bot):
             wins_w_auction = 0
             wins_wo_auction = 0
 
-            for i in range(iters): #without the auction
-                deck.shuffle()
-                opp = 3
-                remaining_community_cards = 2
-                draw = deck.peek(opp+remaining_community_cards)
-                opp_cards = draw[:opp]
-                new_community_cards = draw[opp:]
-                community_cards = new_community_cards + flopcards
+            iters = 0
 
-                our_hand = mycards + community_cards
-                opp_hand = opp_cards + community_cards
+            def sample():
+                #runs another batch of both simulations and returns the difference so far
+                nonlocal wins_w_auction, wins_wo_auction, iters
+                for i in range(batch): #without the auction
+                    deck.shuffle()
+                    opp = 3
+                    remaining_community_cards = 2
+                    draw = deck.peek(opp+remaining_community_cards)
+                    opp_cards = draw[:opp]
+                    new_community_cards = draw[opp:]
+                    community_cards = new_community_cards + flopcards
 
-                our_hand_val = eval7.evaluate(our_hand)
-                opp_hand_val = eval7.evaluate(opp_hand)
+                    our_hand = mycards + community_cards
+                    opp_hand = opp_cards + community_cards
 
-                if our_hand_val > opp_hand_val:
-                    # We won the round
-                    wins_wo_auction += 1
-                if our_hand_val == opp_hand_val:
-                    # We tied the round
-                    wins_wo_auction += .5
-                else:
-                    # We lost the round
-                    wins_wo_auction
+                    our_hand_val = eval7.evaluate(our_hand)
+                    opp_hand_val = eval7.evaluate(opp_hand)
 
-            for i in range(iters): #with the auction
-                deck.shuffle()
-                opp = 2
-                remaining_community_cards = 2
-                auction = 1
-                draw = deck.peek(opp+remaining_community_cards+auction)
-                opp_cards = draw[:opp]
-                community_cards = draw[opp: opp + remaining_community_cards]
-                community_cards = community_cards + flopcards
-                auction_card = draw[opp+remaining_community_cards:]
-
-                our_hand = mycards + auction_card + community_cards
-                opp_hand = opp_cards + community_cards
+                    if our_hand_val > opp_hand_val:
+                        # We won the round
+                        wins_wo_auction += 1
+                    if our_hand_val == opp_hand_val:
+                        # We tied the round
+                        wins_wo_auction += .5
+                    else:
+                        # We lost the round
+                        wins_wo_auction
 
-                our_hand_val = eval7.evaluate(our_hand)
-                opp_hand_val = eval7.evaluate(opp_hand)
+                for i in range(batch): #with the auction
+                    deck.shuffle()
+                    opp = 2
+                    remaining_community_cards = 2
+                    auction = 1
+                    draw = deck.peek(opp+remaining_community_cards+auction)
+                    opp_cards = draw[:opp]
+                    community_cards = draw[opp: opp + remaining_community_cards]
+                    community_cards = community_cards + flopcards
+                    auction_card = draw[opp+remaining_community_cards:]
 
-                if our_hand_val > opp_hand_val:
-                    # We won the round
-                    wins_w_auction += 1
-                elif our_hand_val == opp_hand_val:
-                    # we tied the round
-                    wins_w_auction += .5
-                else:
-                    #We tied the round
-                    wins_w_auction += 0
+                    our_hand = mycards + auction_card + community_cards
+                    opp_hand = opp_cards + community_cards
 
-            strength_w_auction = wins_w_auction / iters
-            strength_wo_auction = wins_wo_auction / iters
-            #return the decimal of the percentage of the number of times it won with the auction and without the auction
+                    our_hand_val = eval7.evaluate(our_hand)
+                    opp_hand_val = eval7.evaluate(opp_hand)
+
+                    if our_hand_val > opp_hand_val:
+                        # We won the round
+                        wins_w_auction += 1
+                    elif our_hand_val == opp_hand_val:
+                        # we tied the round
+                        wins_w_auction += .5
+                    else:
+                        #We tied the round
+                        wins_w_auction += 0
 
-            return strength_w_auction- strength_wo_auction
+                iters += batch
+                strength_w_auction = wins_w_auction / iters
+                strength_wo_auction = wins_wo_auction / iters
+                #return the decimal of the percentage of the number of times it won with the auction and without the auction
+
+                return strength_w_auction- strength_wo_auction
+
+            #keep sampling until this decision's share of the game clock runs out, past 40 batches the estimate barely moves
+            return self.time_budget.anytime(sample, min_steps=2, max_steps=40)
 
         def calculate_TheOddsAfterTheAuction(cardswehave, thecardsontheboard, iters):
             #this one will calculate odds after the auction based on street
@@ -344,31 +367,41 @@ class Player(Bot):
                     pass
 
             else:      #uses random opp cards for the flop
-                for i in range(iters):
-                    deck.shuffle()
-                    draw = deck.peek(opp+community)
-                    opp_cards = draw[:opp]
-                    if community == 0:
-                        community_cards = reformattedboardcards
-                    else:
-                        community_cards = draw[opp:]
-                        community_cards = community_cards + reformattedboardcards
+                samples = 0
+
+                def sample():
+                    #runs another batch of simulations and returns the odds so far
+                    nonlocal wins, samples
+                    for i in range(25):
+                        deck.shuffle()
+                        draw = deck.peek(opp+community)
+                        opp_cards = draw[:opp]
+                        if community == 0:
+                            community_cards = reformattedboardcards
+                        else:
+                            community_cards = draw[opp:]
+                            community_cards = community_cards + reformattedboardcards
 
-                    our_hand = reformattedcardsthatwehave + community_cards
-                    opp_hand = opp_cards + community_cards
+                        our_hand = reformattedcardsthatwehave + community_cards
+                        opp_hand = opp_cards + community_cards
 
-                    our_hand_val = eval7.evaluate(our_hand)
-                    opp_hand_val = eval7.evaluate(opp_hand)
+                        our_hand_val = eval7.evaluate(our_hand)
+                        opp_hand_val = eval7.evaluate(opp_hand)
 
-                    if our_hand_val > opp_hand_val:
-                        # We won the round
-                        wins += 1
-                    if our_hand_val == opp_hand_val:
-                        # We tied the round
-                        wins += .5
-                    else:
-                        # We lost the round
-                        pass
+                        if our_hand_val > opp_hand_val:
+                            # We won the round
+                            wins += 1
+                        if our_hand_val == opp_hand_val:
+                            # We tied the round
+                            wins += .5
+                        else:
+                            # We lost the round
+                            pass
+                    samples += 25
+                    return wins/samples
+
+                #keep sampling until this decision's share of the game clock runs out, past 40 batches the estimate barely moves
+                return self.time_budget.anytime(sample, min_steps=2, max_steps=40)
             return wins/iters
 
 #########################################################################################################################
@@ -378,7 +411,7 @@ class Player(Bot):
 
 
         if BidAction in legal_actions:
-            strength_diff = calculate_ShouldWeBidOnTheAuction(my_cards, board_cards, 200)
+            strength_diff = calculate_ShouldWeBidOnTheAuction(my_cards, board_cards, 25)
             if self.early_game == True:
                 max_bid_percentage = 1
                 min_bid_percentage = 0
@@ -412,7 +445,7 @@ class Player(Bot):
        #########################################################
         if street < 3:
             strength = self.card_strength
-            print("Preflop strenght:", strength)
+            log.debug("Preflop strenght:", strength)
         ########Early game (not taking opp strength into account)#####
         if street < 3 and self.early_game == True:
             if strength > 0.6:
@@ -447,7 +480,7 @@ class Player(Bot):
         ########Late game (taking opp strength into account)#############
 
         elif street < 3 and self.early_game == False:
-            print("Preflop strenght(opp):", self.opp_avg_strength)
+            log.debug("Preflop strenght(opp):", self.opp_avg_strength)
             if strength > self.opp_avg_strength + 0.1:
                 if continue_cost > 50 or pot > 100:
                     return CallAction()
@@ -488,13 +521,13 @@ class Player(Bot):
         elif pot<50:
             if street == 3:
                 strength = calculate_TheOddsAfterTheAuction(my_cards, board_cards, 300)
-                print("Flop Strength:", strength)
+                log.debug("Flop Strength:", strength)
             elif street == 4:
                 strength = calculate_TheOddsAfterTheAuction(my_cards, board_cards, 300)
-                print("Turn Strength:", strength)
+                log.debug("Turn Strength:", strength)
             if street == 5:
                 strength = calculate_TheOddsAfterTheAuction(my_cards, board_cards, 300)
-                print("River Strength:", strength)
+                log.debug("River Strength:", strength)
 
             #######early game (no opp strength)###########
             if self.early_game == True:
@@ -537,11 +570,11 @@ class Player(Bot):
             #####Late game (using opp pre flop strength)###############
             elif self.early_game == False:
                 if street == 3:
-                    print("Flop Strength(opp):", self.opp_avg_strength)
+                    log.debug("Flop Strength(opp):", self.opp_avg_strength)
                 elif street == 4:
-                    print("Turn Strength(opp):", self.opp_avg_strength)
+                    log.debug("Turn Strength(opp):", self.opp_avg_strength)
                 if street == 5:
-                    print("River Strength(opp):", self.opp_avg_strength)
+                    log.debug("River Strength(opp):", self.opp_avg_strength)
                 if strength > self.opp_avg_strength + 0.25:
                     if continue_cost > 50 or pot > 100:
                         return CallAction()
@@ -576,13 +609,13 @@ class Player(Bot):
         else:
             if street == 3:
                 strength = calculate_TheOddsAfterTheAuction(my_cards, board_cards, 300)
-                print("Flop Strength:", strength)
+                log.debug("Flop Strength:", strength)
             elif street == 4:
                 strength = calculate_TheOddsAfterTheAuction(my_cards, board_cards, 300)
-                print("Turn Strength:", strength)
+                log.debug("Turn Strength:", strength)
             if street == 5:
                 strength = calculate_TheOddsAfterTheAuction(my_cards, board_cards, 300)
-                print("River Strength:", strength)
+                log.debug("River Strength:", strength)
 
             raise_cost_strong = int(continue_cost + 0.5*pot)
             raise_cost_weak = int(continue_cost + 0.25*pot)
@@ -613,7 +646,7 @@ class Player(Bot):
 
         if continue_cost > 0:
             pot_odds = continue_cost/(continue_cost + pot)
-            print("pot odds:", pot_odds)
+            log.debug("pot odds:", pot_odds)
             if strength >= pot_odds:
                 if strength > 0.95 and RaiseAction in legal_actions:
                     my_action = RaiseAction(max_raise)
@@ -0,0 +1,228 @@
+'''
+Plays two pokerbots against each other in one process, for tests and parameter sweeps.
+
+The harness deals and enforces the rules like the engine and hands each pokerbot's Runner
+the same text messages the engine would send, so pokerbots play exactly as in a match,
+without sockets, subprocesses or config.py. Showdowns are scored with eval7.
+
+bench_engine.py measures allinbot against itself at about 8k hands/s on one core, 3.5 to 4 times
+the engine over sockets. Most of what is left is the pokerbots' own Runners and get_action.
+
+Usage, from a pokerbot directory: python3 -m skeleton.harness player:Player other:Player
+'''
+from contextlib import redirect_stdout
+from collections import namedtuple
+import importlib
+import argparse
+import random
+import time
+import sys
+import os
+import io
+
+import eval7
+
+from .actions import FoldAction, CallAction, CheckAction, RaiseAction, BidAction
+from .states import TerminalState, RoundState
+from .states import NUM_ROUNDS, STARTING_STACK, BIG_BLIND, SMALL_BLIND
+from .runner import Runner, CARD_NAMES
+from .log import log, OFF
+
+STARTING_GAME_CLOCK = 30.
+DECODE = {'F': FoldAction, 'C': CallAction, 'K': CheckAction, 'R': RaiseAction, 'A': BidAction}
+ENCODE = {action: code for code, action in DECODE.items()}
+EVAL7_CARDS = {name: eval7.Card(name) for name in CARD_NAMES}
+
+# bankrolls, game clocks and timeouts are in the order the pokerbots were passed,
+# deltas are the first pokerbot's result in every hand
+MatchResult = namedtuple('MatchResult', ['bankrolls', 'deltas', 'game_clocks', 'timeouts', 'hands', 'seconds'])
+
+
+class HarnessPlayer():
+    '''
+    A pokerbot and its Runner, queried the way the engine queries a Player.
+    '''
+
+    def __init__(self, pokerbot, game_clock):
+        self.response = io.StringIO()
+        self.runner = Runner(pokerbot, self.response)
+        # nothing happens between messages here, so there is no time to ponder in
+        self.runner.ponderer = None
+        self.game_clock = game_clock
+        self.timed_out = False
+        self.bankroll = 0
+        self.message = ['T0.']
+
+    def query(self, round_state, legal_actions):
+        '''
+        Sends the pending clauses and returns the pokerbot's action, or the action the engine
+        substitutes for a late, illegal or misformatted one.
+        '''
+        if self.game_clock > 0.:
+            self.message[0] = 'T{:.3f}'.format(self.game_clock)
+            packet = self.message
+            self.message = ['T0.']
+            start_time = time.perf_counter()
+            self.runner.handle_text(packet)
+            self.game_clock -= time.perf_counter() - start_time
+            clause = self.response.getvalue().strip()
+            self.response.seek(0)
+            self.response.truncate()
+            if self.game_clock <= 0.:
+                # the engine stops waiting for a pokerbot whose clock runs out
+                self.game_clock = 0.
+                self.timed_out = True
+            else:
+                action = self.decode_action(clause, round_state, legal_actions)
+                if action is not None:
+                    return action
+        else:
+            del self.message[1:]
+        if BidAction in legal_actions:
+            return BidAction(0)
+        return CheckAction() if CheckAction in legal_actions else FoldAction()
+
+    def decode_action(self, clause, round_state, legal_actions):
+        '''
+        Returns the legal action a response encodes, or None.
+        '''
+        action = DECODE.get(clause[:1])
+        if action not in legal_actions:
+            return None
+        if action is RaiseAction or action is BidAction:
+            try:
+                amount = int(clause[1:])
+            except ValueError:
+                return None
+            if action is RaiseAction:
+                low, high = round_state.raise_bounds()
+            else:  # bids may be anything up to the bidder's stack
+                low, high = 0, round_state.stacks[round_state.button % 2]
+            return action(amount) if low <= amount <= high else None
+        return action()
+
+
+def showdown(round_state):
+    '''
+    Scores a round that reached the river, as the engine does.
+    '''
+    board = [EVAL7_CARDS[card] for card in round_state.deck[:5]]
+    score_0 = eval7.evaluate(board + [EVAL7_CARDS[card] for card in round_state.hands[0]])
+    score_1 = eval7.evaluate(board + [EVAL7_CARDS[card] for card in round_state.hands[1]])
+    if score_0 > score_1:
+        delta = STARTING_STACK - round_state.stacks[1]
+    elif score_0 < score_1:
+        delta = round_state.stacks[0] - STARTING_STACK
+    else:  # split the pot
+        delta = (round_state.stacks[0] - round_state.stacks[1]) // 2
+    return TerminalState([delta, -delta], round_state.bids, round_state)
+
+
+def play_hand(players, rng):
+    '''
+    Plays one hand between the players in seat order and returns its TerminalState.
+    '''
+    cards = rng.sample(CARD_NAMES, 11)
+    hands = [cards[0:2], cards[2:4]]
+    # the board, followed in cards by the two the auction deals
+    deck = cards[4:9]
+    round_state = RoundState(0, 0, False, [None, None], [SMALL_BLIND, BIG_BLIND],
+                             [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND], hands, deck, None)
+    for seat, player in enumerate(players):
+        player.message += ['P' + str(seat), 'H' + ','.join(hands[seat])]
+    while not isinstance(round_state, TerminalState):
+        if round_state.street > 0 and round_state.button == 1:
+            if round_state.street == 3 and not round_state.auction:
+                stacks_and_bids = 'N{},{}_{},{}_'.format(*round_state.stacks, *round_state.bids)
+                for seat, player in enumerate(players):
+                    player.message += ['P' + str(seat), stacks_and_bids + ','.join(hands[seat])]
+            board = 'B' + ','.join(deck[:round_state.street])
+            for player in players:
+                player.message.append(board)
+        legal_actions = round_state.legal_actions()
+        action = players[round_state.button % 2].query(round_state, legal_actions)
+        code = ENCODE[type(action)] + (str(action.amount) if isinstance(action, (RaiseAction, BidAction)) else '')
+        for player in players:
+            player.message.append(code)
+        round_state = round_state.proceed(action)
+        if isinstance(action, BidAction) and not round_state.auction:
+            # as in the engine, the winner gets the last card, and on a tie seat 1 gets the one before it
+            if round_state.bids[0] == round_state.bids[1]:
+                hands[0].append(cards[10])
+                hands[1].append(cards[9])
+            else:
+                hands[round_state.bids.index(max(round_state.bids))].append(cards[10])
+    previous_state = round_state.previous_state
+    if FoldAction not in previous_state.legal_actions():
+        round_state = showdown(previous_state)
+        players[0].message.append('O' + ','.join(hands[1]))
+        players[1].message.append('O' + ','.join(hands[0]))
+    for player, delta in zip(players, round_state.deltas):
+        player.message.append('D' + str(delta))
+        player.query(round_state, {CheckAction})
+        player.bankroll += delta
+    return round_state
+
+
+def play(pokerbot_1, pokerbot_2, num_hands=NUM_ROUNDS, seed=None, game_clock=STARTING_GAME_CLOCK, quiet=True):
+    '''
+    Plays num_hands hands between two pokerbots, which swap seats every hand like in the
+    engine, and returns a MatchResult. The same seed deals the same cards. quiet discards
+    what the pokerbots print and log. Exceptions raised by the pokerbots are not caught.
+    '''
+    rng = random.Random(seed)
+    players = [HarnessPlayer(pokerbot_1, game_clock), HarnessPlayer(pokerbot_2, game_clock)]
+    deltas = []
+    level = log.level
+    start_time = time.perf_counter()
+    with open(os.devnull, 'w') as sink, redirect_stdout(sink if quiet else sys.stdout):
+        if quiet:
+            log.set_level(OFF)
+        try:
+            seats = players
+            for _ in range(num_hands):
+                terminal_state = play_hand(seats, rng)
+                deltas.append(terminal_state.deltas[seats.index(players[0])])
+                seats = seats[::-1]
+            for player in players:
+                player.runner.handle_text(['Q'])
+        finally:
+            # also stops the log thread of pokerbots that raised
+            for player in players:
+                player.runner.close()
+            log.set_level(level)
+    return MatchResult([player.bankroll for player in players], deltas,
+                       [player.game_clock for player in players], [player.timed_out for player in players],
+                       num_hands, time.perf_counter() - start_time)
+
+
+def load_pokerbot(spec):
+    '''
+    Returns a new pokerbot from a 'module:Class' spec, such as 'player:Player'.
+    '''
+    module_name, _, class_name = spec.partition(':')
+    return getattr(importlib.import_module(module_name), class_name or 'Player')()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python3 -m skeleton.harness')
+    parser.add_argument('pokerbots', type=str, nargs=2, help='Pokerbots to play, as module:Class')
+    parser.add_argument('--hands', type=int, default=NUM_ROUNDS, help='Number of hands')
+    parser.add_argument('--seed', type=int, default=None, help='Seed of the deals')
+    parser.add_argument('--clock', type=float, default=STARTING_GAME_CLOCK, help='Starting game clock in seconds')
+    parser.add_argument('--verbose', action='store_true', help='Show what the pokerbots print and log')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    sys.path.insert(0, os.getcwd())
+    result = play(load_pokerbot(args.pokerbots[0]), load_pokerbot(args.pokerbots[1]),
+                  args.hands, args.seed, args.clock, not args.verbose)
+    for spec, bankroll, game_clock, timed_out in zip(args.pokerbots, result.bankrolls, result.game_clocks, result.timeouts):
+        print('{}: {:+d}, {:.3f}s left{}'.format(spec, bankroll, game_clock, ', ran out of time' if timed_out else ''))
+    print('{} hands in {:.3f}s'.format(result.hands, result.seconds))
+
+
+if __name__ == '__main__':
+    main()
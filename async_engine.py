@@ -0,0 +1,375 @@
+'''
+An asyncio variant of the engine. One process supervises many concurrent matches
+against subprocess pokerbots, and every match still enforces its own game clocks.
+'''
+from contextlib import redirect_stdout
+import argparse
+import asyncio
+import tempfile
+import socket
+import shutil
+import json
+import time
+import os
+
+from buildcache import BuildCache
+from engine import Game, Player, RoundState, TerminalState, CheckAction
+from engine import RESPONSE, WIRE_VERSION, encode_binary, decode_binary
+from metrics import write_metrics
+from tournament import summarize
+from config import *
+
+
+class TimedStreamReader(asyncio.StreamReader):
+    '''
+    A stream reader that stamps when data arrives. The coroutine waiting on a response resumes
+    only when the event loop gets to it, possibly after other matches' work, so the arrival time
+    is what the game clock charges. Data that arrives while another match holds the loop is
+    stamped once that match yields, so a match that never yields still delays its neighbours.
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self.arrival_time = 0.
+
+    def feed_data(self, data):
+        self.arrival_time = time.perf_counter()
+        super().feed_data(data)
+
+
+class AsyncPlayer(Player):
+    '''
+    Handles subprocess and socket interactions with one player's pokerbot as coroutines.
+    The socketfile attribute holds the stream writer and reader holds the stream reader.
+    '''
+
+    def __init__(self, name, path, log_dir='.', append_log=False):
+        super().__init__(name, path, log_dir, append_log)
+        self.reader = None
+        self.capture_task = None
+
+    async def build(self):
+        '''
+        Loads the commands file and builds the pokerbot.
+        '''
+        self.load_commands()
+        if self.commands is not None and len(self.commands['build']) > 0:
+            build_cache = BuildCache(BUILD_CACHE_DIR) if BUILD_CACHE_DIR is not None else None
+            try:
+                if build_cache is not None:
+                    # hashing reads the whole pokerbot directory, so it stays off the event loop
+                    output, inputs = await asyncio.to_thread(build_cache.replay, self.path, self.commands['build'])
+                    if output is not None:
+                        print(self.name, 'is unchanged, using its cached build')
+                        self.player_log.write(output)
+                        return
+                proc = await asyncio.create_subprocess_exec(*self.commands['build'],
+                                                            stdout=asyncio.subprocess.PIPE,
+                                                            stderr=asyncio.subprocess.STDOUT,
+                                                            cwd=self.path)
+            except (TypeError, ValueError):
+                print(self.name, 'build command misformatted')
+                return
+            except OSError:
+                print(self.name, 'build failed - check "build" in commands.json')
+                return
+            try:
+                outs, _ = await asyncio.wait_for(proc.communicate(), BUILD_TIMEOUT)
+                self.player_log.write(outs)
+                if build_cache is not None and proc.returncode == 0:
+                    await asyncio.to_thread(build_cache.store, self.path, self.commands['build'], inputs, outs)
+            except asyncio.TimeoutError:
+                error_message = 'Timed out waiting for ' + self.name + ' to build'
+                print(error_message)
+                proc.kill()
+                outs, _ = await proc.communicate()
+                self.player_log.write(outs)
+                self.player_log.write(error_message)
+
+    async def run(self):
+        '''
+        Runs the pokerbot and establishes the socket connection.
+        '''
+        if self.commands is not None and len(self.commands['run']) > 0:
+            socket_dir = None
+            server = None
+            connection = asyncio.get_running_loop().create_future()
+
+            def accept(reader, writer):
+                if connection.done():
+                    writer.close()
+                else:
+                    connection.set_result((reader, writer))
+
+            # the streams asyncio.start_server would make, with a reader that stamps arrivals
+            loop = asyncio.get_running_loop()
+            protocol = lambda: asyncio.StreamReaderProtocol(TimedStreamReader(), accept)
+            try:
+                if TRANSPORT == 'socketpair':
+                    client_socket, bot_socket = socket.socketpair()
+                    with bot_socket:
+                        await self.start(['--fd', str(bot_socket.fileno())], (bot_socket.fileno(),))
+                    await loop.create_connection(protocol, sock=client_socket)
+                elif TRANSPORT == 'unix':
+                    socket_dir = tempfile.mkdtemp(prefix='pokerbots-')
+                    address = os.path.join(socket_dir, self.name + '.sock')
+                    server = await loop.create_unix_server(protocol, address)
+                    await self.start(['--unix', address])
+                else:
+                    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    server_socket.bind(('', 0))
+                    server = await loop.create_server(protocol, sock=server_socket)
+                    await self.start([str(server_socket.getsockname()[1])])
+                # wait until we timeout or the player connects
+                reader, writer = await asyncio.wait_for(connection, CONNECT_TIMEOUT)
+                await self.connect(reader, writer)
+            except (TypeError, ValueError):
+                print(self.name, 'run command misformatted')
+            except asyncio.TimeoutError:
+                print('Timed out waiting for', self.name, 'to connect')
+            except OSError:
+                print(self.name, 'run failed - check "run" in commands.json')
+            finally:
+                if server is not None:
+                    server.close()
+                if socket_dir is not None:
+                    shutil.rmtree(socket_dir, ignore_errors=True)
+
+    async def start(self, arguments, pass_fds=()):
+        '''
+        Starts the pokerbot subprocess and a task that collects its output.
+        '''
+        proc = await asyncio.create_subprocess_exec(*(self.commands['run'] + arguments),
+                                                    stdout=asyncio.subprocess.PIPE,
+                                                    stderr=asyncio.subprocess.STDOUT,
+                                                    cwd=self.path, pass_fds=pass_fds, env=self.env)
+        self.bot_subprocess = proc
+        self.capture_task = asyncio.create_task(self.capture(proc.stdout))
+
+    async def capture(self, stream):
+        '''
+        Collects the pokerbot's output until it exits.
+        '''
+        while True:
+            output = await stream.read(65536)
+            if not output:
+                break
+            self.player_log.write(output)
+
+    async def connect(self, reader, writer):
+        '''
+        Keeps the connected streams and negotiates the wire protocol.
+        '''
+        self.reader = reader
+        self.socketfile = writer
+        if WIRE_PROTOCOL == 'binary':
+            await self.negotiate()
+        print(self.name, 'connected successfully' + (' (binary)' if self.binary else ''))
+        self.start_cpu_clock()
+
+    async def negotiate(self):
+        '''
+        Offers the binary protocol. Pokerbots that do not accept it keep the text protocol.
+        '''
+        self.socketfile.write((WIRE_VERSION + '\n').encode())
+        reply = await asyncio.wait_for(self.reader.readline(), CONNECT_TIMEOUT)
+        self.binary = reply.decode().strip() == WIRE_VERSION
+
+    async def stop(self):
+        '''
+        Closes the socket connection and stops the pokerbot.
+        '''
+        if self.socketfile is not None:
+            try:
+                self.socketfile.write(encode_binary(['Q']) if self.binary else b'Q\n')
+                self.socketfile.close()
+            except OSError:
+                print('Could not close socket connection with', self.name)
+        if self.bot_subprocess is not None:
+            try:
+                await asyncio.wait_for(self.bot_subprocess.wait(), CONNECT_TIMEOUT)
+            except asyncio.TimeoutError:
+                print('Timed out waiting for', self.name, 'to quit')
+                self.bot_subprocess.kill()
+                await self.bot_subprocess.wait()
+            await self.capture_task
+        self.close_stat()
+        self.close_log()
+
+    async def query(self, round_state, player_message, game_log):
+        '''
+        Requests one action from the pokerbot over the socket connection.
+        At the end of the round, we request a CheckAction from the pokerbot.
+        '''
+        legal_actions = round_state.legal_actions() if isinstance(round_state, RoundState) else {CheckAction}
+        self.response_time = 0.
+        if self.socketfile is not None and self.game_clock > 0.:
+            clause = ''
+            try:
+                message = self.encode_message(player_message)
+                # a pokerbot never waits longer than its remaining game clock, however busy the loop is,
+                # unless the clock counts CPU time, which waiting does not use
+                timeout = self.game_clock if ENFORCE_GAME_CLOCK and GAME_CLOCK_MODE == 'wall' else CONNECT_TIMEOUT
+                self.start_cpu_sample()
+                start_time = time.perf_counter()
+                self.socketfile.write(message if self.binary else message.encode())
+                await self.socketfile.drain()
+                clause = await asyncio.wait_for(self.read_response(), timeout)
+                # charged until the response arrived, not until this match's turn on the loop came
+                end_time = max(start_time, self.reader.arrival_time)
+                self.charge(end_time - start_time, round_state, legal_actions)
+                action = self.decode_action(clause, round_state, legal_actions, game_log)
+                if action is not None:
+                    return action
+            except (asyncio.TimeoutError, socket.timeout):
+                self.disconnect(self.name + ' ran out of time', game_log)
+            except OSError:
+                self.disconnect(self.name + ' disconnected', game_log)
+            except (IndexError, KeyError, ValueError) as error:
+                self.misformatted(clause, error, game_log)
+        return self.default_action(legal_actions)
+
+    async def read_response(self):
+        '''
+        Reads one response and returns it as a text clause.
+        '''
+        if self.binary:
+            try:
+                return decode_binary(await self.reader.readexactly(RESPONSE.size))
+            except asyncio.IncompleteReadError as error:
+                # the pokerbot closed the connection, a short read as in engine.py
+                return decode_binary(error.partial)
+        return (await self.reader.readline()).decode().strip()
+
+
+class AsyncGame(Game):
+    '''
+    Runs one game of poker as a coroutine, so many games can share one event loop.
+    '''
+
+    async def run_round(self, players, replay=False):
+        '''
+        Runs one round of poker (1 hand).
+        '''
+        round_state = self.deal_round(replay)
+        actions = []
+        while not isinstance(round_state, TerminalState):
+            self.log_round_state(players, round_state)
+            active = round_state.button % 2
+            player = players[active]
+            action = await player.query(round_state, self.player_messages[active], self.log)
+            self.record_action(actions, active, player, round_state, action)
+            round_state = round_state.proceed(action)
+        self.record_round(players, round_state, actions)
+        for player, player_message, delta in zip(players, self.player_messages, round_state.deltas):
+            await player.query(round_state, player_message, self.log)
+            player.bankroll += delta
+
+    async def run(self):
+        '''
+        Runs one game of poker.
+        '''
+        state = self.load_checkpoint() if self.resume else None
+        if state is not None:
+            print('Resuming', self.log_dir, 'after round', state['round_num'])
+        print('Starting', self.log_dir, 'with seed', self.seed, '(duplicate)' if self.duplicate else '')
+        self.open_logs(state['offsets'] if state is not None else None)
+        players = [AsyncPlayer(name, path, self.log_dir, state is not None) for name, path in self.player_specs]
+        stopped = False
+        try:
+            for player in players:
+                await player.build()
+            await asyncio.gather(*[player.run() for player in players])
+            if state is not None:
+                for player in players:
+                    player.bankroll = state['bankrolls'][player.name]
+                    player.game_clock = state['game_clocks'][player.name]
+                # the seats swap every round
+                players = players[::-1] if self.round_num % 2 else players
+            for round_num in range(self.round_num + 1, self.num_rounds + 1):
+                self.start_round(players, round_num)
+                # in duplicate mode every even round replays the previous deal with the seats swapped
+                await self.run_round(players, self.duplicate and round_num % 2 == 0)
+                self.log.end_round()
+                players = players[::-1]
+                if CHECKPOINT_INTERVAL > 0 and round_num % CHECKPOINT_INTERVAL == 0 and round_num < self.num_rounds:
+                    self.checkpoint(players)
+            self.end_game(players)
+            await asyncio.gather(*[player.stop() for player in players])
+            stopped = True
+            if WRITE_METRICS:
+                write_metrics(os.path.join(self.log_dir, GAME_LOG_FILENAME + '_metrics.json'), players)
+            # a finished game is not resumed
+            if os.path.exists(self.checkpoint_name()):
+                os.remove(self.checkpoint_name())
+        finally:
+            if not stopped:
+                # a game that failed midway still stops its pokerbots
+                await asyncio.gather(*[player.stop() for player in players], return_exceptions=True)
+            self.close_logs()
+        return {player.name: player.bankroll for player in players}
+
+
+async def run_matches(matches, concurrency):
+    '''
+    Runs matches on one event loop, at most concurrency at a time, and returns
+    (index, seed, player 1's bankroll) for each. Matches are the tuples of tournament.py.
+    '''
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_match(match):
+        index, seed, player_1, player_2, num_rounds, log_dir, _, duplicate = match
+        async with semaphore:
+            os.makedirs(log_dir, exist_ok=True)
+            bankrolls = await AsyncGame(player_1, player_2, num_rounds, log_dir, False, seed, duplicate).run()
+        return index, seed, bankrolls[player_1[0]]
+
+    return await asyncio.gather(*[run_match(match) for match in matches])
+
+
+def parse_args():
+    '''
+    Parses the match configuration. Defaults come from config.py.
+    '''
+    parser = argparse.ArgumentParser(prog='python3 async_engine.py')
+    parser.add_argument('--player-1', type=str, default=PLAYER_1_PATH, help='Path to the first pokerbot')
+    parser.add_argument('--player-2', type=str, default=PLAYER_2_PATH, help='Path to the second pokerbot')
+    parser.add_argument('--matches', type=int, default=100, help='Number of independent matches')
+    parser.add_argument('--concurrency', type=int, default=64, help='Number of matches played at once')
+    parser.add_argument('--rounds', type=int, default=NUM_ROUNDS, help='Rounds per match')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the first match; match i uses seed + i')
+    parser.add_argument('--confidence', type=float, default=0.95, help='Confidence level of the interval')
+    parser.add_argument('--duplicate', action='store_true', default=DUPLICATE, help='Replay every deal with the seats swapped')
+    parser.add_argument('--out', type=str, default='tournament', help='Directory for match logs and the summary')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    player_1 = (PLAYER_1_NAME, args.player_1)
+    player_2 = (PLAYER_2_NAME, args.player_2)
+    matches = [(i, args.seed + i, player_1, player_2, args.rounds,
+                os.path.join(args.out, 'match_{:04d}'.format(i)), False, args.duplicate)
+               for i in range(args.matches)]
+    os.makedirs(args.out, exist_ok=True)
+    # the matches share stdout, so the engine's messages for all of them go to one file
+    with open(os.path.join(args.out, 'engine.txt'), 'w') as engine_output:
+        with redirect_stdout(engine_output):
+            results = asyncio.run(run_matches(matches, args.concurrency))
+    for index, seed, bankroll in results:
+        print('Match {} (seed {}): {} {}'.format(index, seed, PLAYER_1_NAME, bankroll))
+    summary = summarize(results, args.rounds, args.confidence)
+    summary['player_1'] = args.player_1
+    summary['player_2'] = args.player_2
+    summary['duplicate'] = args.duplicate
+    print('{} vs {} over {} matches of {} rounds'.format(args.player_1, args.player_2, summary['matches'], args.rounds))
+    print('Mean {:.1f}, standard error {:.1f}, {:.0%} interval [{:.1f}, {:.1f}]'.format(
+        summary['mean'], summary['std_error'], args.confidence, *summary['interval']))
+    name = os.path.join(args.out, 'summary.json')
+    print('Writing', name)
+    with open(name, 'w') as summary_file:
+        json.dump(summary, summary_file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
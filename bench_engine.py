@@ -0,0 +1,388 @@
+'''
+Micro-benchmarks for the engine. Run from the repository root:
+
+    python3 bench_engine.py --out bench.json
+
+Hands are recorded once with a seeded random policy and then replayed, so every
+benchmark times the same action sequences. Each benchmark reports its fastest repeat.
+'''
+from contextlib import redirect_stdout
+import importlib
+import argparse
+import platform
+import tempfile
+import random
+import shutil
+import time
+import json
+import sys
+import io
+import os
+
+import eval7
+
+from engine import Game, GameLog, RoundState, TerminalState
+from engine import FoldAction, CallAction, CheckAction, RaiseAction, BidAction
+from engine import STARTING_STACK, BIG_BLIND, SMALL_BLIND, TRANSPORT, WIRE_PROTOCOL, GAME_LOG_BUFFER_SIZE
+
+
+class BenchPlayer():
+    '''
+    Stands in for a Player in the logging methods, which only need a name.
+    '''
+
+    def __init__(self, name):
+        self.name = name
+        self.bankroll = 0
+
+
+def new_round(deck, hands):
+    '''
+    Returns the opening RoundState of a recorded hand, as Game.run_round builds it.
+    '''
+    pips = [SMALL_BLIND, BIG_BLIND]
+    stacks = [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND]
+    return RoundState(0, 0, False, [None, None], pips, stacks, [list(hands[0]), list(hands[1])], deck)
+
+
+def choose_action(round_state, rng):
+    '''
+    A random legal action that folds rarely, so most hands see several streets.
+    '''
+    legal_actions = round_state.legal_actions()
+    if BidAction in legal_actions:
+        min_bid, max_bid = round_state.bid_bounds()
+        return BidAction(rng.randint(min_bid, min(max_bid, 40)))
+    if RaiseAction in legal_actions and rng.random() < 0.25:
+        min_raise, max_raise = round_state.raise_bounds()
+        return RaiseAction(rng.randint(min_raise, max(min_raise, min(max_raise, 4 * min_raise))))
+    if FoldAction in legal_actions and rng.random() < 0.05:
+        return FoldAction()
+    return CheckAction() if CheckAction in legal_actions else CallAction()
+
+
+def record_hands(num_hands, seed):
+    '''
+    Plays num_hands hands with the random policy and returns (deck, hands, actions) for each.
+    Decks are only peeked at after the deal, so replays can share them.
+    '''
+    rng = random.Random(seed)
+    recorded = []
+    for _ in range(num_hands):
+        deck = eval7.Deck()
+        rng.shuffle(deck.cards)
+        hands = [deck.deal(2), deck.deal(2)]
+        round_state = new_round(deck, hands)
+        actions = []
+        while not isinstance(round_state, TerminalState):
+            action = choose_action(round_state, rng)
+            actions.append(action)
+            round_state = round_state.proceed(action)
+        recorded.append((deck, hands, actions))
+    return recorded
+
+
+def best_of(repeat, function):
+    '''
+    Returns the fastest of repeat timed calls, in seconds.
+    '''
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start_time)
+    return min(times)
+
+
+def replay(recorded):
+    for deck, hands, actions in recorded:
+        round_state = new_round(deck, hands)
+        for action in actions:
+            round_state = round_state.proceed(action)
+
+
+def replay_legal_actions(recorded):
+    for deck, hands, actions in recorded:
+        round_state = new_round(deck, hands)
+        for action in actions:
+            round_state.legal_actions()
+            round_state = round_state.proceed(action)
+
+
+def replay_raise_bounds(recorded):
+    for deck, hands, actions in recorded:
+        round_state = new_round(deck, hands)
+        for action in actions:
+            round_state.raise_bounds()
+            round_state = round_state.proceed(action)
+
+
+def replay_engine(recorded):
+    '''
+    Replays the calls Player.query makes for every action.
+    '''
+    for deck, hands, actions in recorded:
+        round_state = new_round(deck, hands)
+        for action in actions:
+            if RaiseAction in round_state.legal_actions():
+                round_state.raise_bounds()
+            round_state = round_state.proceed(action)
+
+
+def bench_round_state(recorded, repeat):
+    '''
+    Times RoundState.proceed alone, and the extra cost of legal_actions and raise_bounds per action.
+    '''
+    num_actions = sum(len(actions) for _, _, actions in recorded)
+    proceed = best_of(repeat, lambda: replay(recorded))
+    legal_actions = best_of(repeat, lambda: replay_legal_actions(recorded))
+    raise_bounds = best_of(repeat, lambda: replay_raise_bounds(recorded))
+    engine = best_of(repeat, lambda: replay_engine(recorded))
+    return {
+        'actions': num_actions,
+        'proceed_actions_per_second': num_actions / proceed,
+        'proceed_hands_per_second': len(recorded) / proceed,
+        'legal_actions_ns': 1e9 * max(legal_actions - proceed, 0.) / num_actions,
+        'raise_bounds_ns': 1e9 * max(raise_bounds - proceed, 0.) / num_actions,
+        'engine_actions_per_second': num_actions / engine,
+    }
+
+
+def bench_logging(recorded, repeat):
+    '''
+    Times Game.log_round_state, log_action and log_terminal_state on top of a plain replay,
+    rendering the game log and with the game log disabled.
+    '''
+    game = Game(('A', None), ('B', None))
+    players = [BenchPlayer('A'), BenchPlayer('B')]
+
+    def replay_logged(name):
+        game.log = GameLog(name, GAME_LOG_BUFFER_SIZE, False)
+        for deck, hands, actions in recorded:
+            round_state = new_round(deck, hands)
+            for action in actions:
+                game.log_round_state(players, round_state)
+                game.log_action(players[round_state.button % 2].name, action, round_state.pips == [0, 0])
+                round_state = round_state.proceed(action)
+            game.log_terminal_state(players, round_state)
+            game.log.end_round()
+        game.log.close()
+
+    proceed = best_of(repeat, lambda: replay(recorded))
+    logged = best_of(repeat, lambda: replay_logged(os.devnull))
+    disabled = best_of(repeat, lambda: replay_logged(None))
+    return {
+        'hands_per_second': len(recorded) / logged,
+        'formatting_us_per_hand': 1e6 * max(logged - proceed, 0.) / len(recorded),
+        'disabled_us_per_hand': 1e6 * max(disabled - proceed, 0.) / len(recorded),
+    }
+
+
+def bench_showdown(recorded, repeat):
+    '''
+    Times RoundState.showdown, which evaluates both hands with eval7, on every hand that reached one.
+    '''
+    river_states = []
+    for deck, hands, actions in recorded:
+        round_state = new_round(deck, hands)
+        for action in actions:
+            round_state = round_state.proceed(action)
+        if FoldAction not in round_state.previous_state.legal_actions():
+            river_states.append(round_state.previous_state)
+
+    def showdowns():
+        for round_state in river_states:
+            round_state.showdown()
+
+    elapsed = best_of(repeat, showdowns)
+    return {
+        'showdowns': len(river_states),
+        'showdowns_per_second': len(river_states) / elapsed if river_states else 0.,
+        'us_per_showdown': 1e6 * elapsed / len(river_states) if river_states else 0.,
+    }
+
+
+def record_messages(recorded):
+    '''
+    Returns the text messages the engine sends player A over the recorded hands, each with
+    the action A answers, or None for an acknowledgement. A and B swap seats every round.
+    '''
+    game = Game(('A', None), ('B', None))
+    game.log = GameLog(None, 0, False)
+    players = [BenchPlayer('A'), BenchPlayer('B')]
+    exchanges = []
+
+    def encode(player_message):
+        # as Player.encode_message does for the text protocol
+        player_message[0] = 'T30.000'
+        message = ' '.join(player_message)
+        del player_message[1:]
+        return message
+
+    for round_num, (deck, hands, actions) in enumerate(recorded):
+        seat = round_num % 2
+        round_state = new_round(deck, hands)
+        for action in actions:
+            game.log_round_state(players, round_state)
+            active = round_state.button % 2
+            message = encode(game.player_messages[active])
+            if active == seat:
+                exchanges.append((message, action))
+            game.log_action(players[active].name, action, round_state.pips == [0, 0])
+            round_state = round_state.proceed(action)
+        game.log_terminal_state(players, round_state)
+        exchanges.append((encode(game.player_messages[seat]), None))
+        encode(game.player_messages[1 - seat])
+    return exchanges
+
+
+def load_skeleton(path):
+    '''
+    Imports the skeleton package of the pokerbot at path and returns its runner and actions modules.
+    '''
+    bot_path = os.path.abspath(path)
+    isolated = lambda name: name == 'skeleton' or name.startswith('skeleton.')
+    saved_modules = {name: sys.modules.pop(name) for name in list(sys.modules) if isolated(name)}
+    sys.path.insert(0, bot_path)
+    try:
+        return importlib.import_module('skeleton.runner'), importlib.import_module('skeleton.actions')
+    finally:
+        sys.path.remove(bot_path)
+        for name in [name for name in sys.modules if isolated(name)]:
+            del sys.modules[name]
+        sys.modules.update(saved_modules)
+
+
+def bench_runner(recorded, path, repeat):
+    '''
+    Times the Runner of the pokerbot skeleton at path on the messages of the recorded hands.
+    The pokerbot only replays its recorded actions, so this is the skeleton's per-message overhead.
+    '''
+    runner_module, actions_module = load_skeleton(path)
+    exchanges = record_messages(recorded)
+    packets = [message.split(' ') for message, _ in exchanges]
+    responses = [getattr(actions_module, type(action).__name__)(*action) for _, action in exchanges if action is not None]
+
+    class ReplayBot(runner_module.Bot):
+        def __init__(self):
+            self.responses = iter(responses)
+
+        def handle_new_round(self, game_state, round_state, active):
+            pass
+
+        def handle_round_over(self, game_state, terminal_state, active):
+            pass
+
+        def get_action(self, game_state, round_state, active):
+            return next(self.responses)
+
+    def play():
+        runner = runner_module.Runner(ReplayBot(), io.StringIO())
+        # as the engine's LocalChannel, which also supports skeletons without handle_text
+        handle_text = getattr(runner, 'handle_text', None) or (lambda packet: runner.handle_packet(runner.parse_text(packet)))
+        with redirect_stdout(io.StringIO()):
+            for packet in packets:
+                handle_text(packet)
+
+    elapsed = best_of(repeat, play)
+    return {
+        'messages': len(packets),
+        'messages_per_second': len(packets) / elapsed,
+        'us_per_message': 1e6 * elapsed / len(packets),
+    }
+
+
+def bench_end_to_end(path, num_rounds, headless, repeat):
+    '''
+    Times whole games of the pokerbot at path against itself, including startup.
+    '''
+    log_dir = tempfile.mkdtemp(prefix='pokerbots-bench-')
+    try:
+        def play():
+            with redirect_stdout(io.StringIO()):
+                Game(('A', path), ('B', path), num_rounds, log_dir, headless, 0).run()
+        elapsed = best_of(repeat, play)
+    finally:
+        shutil.rmtree(log_dir, ignore_errors=True)
+    return {
+        'rounds': num_rounds,
+        'seconds': elapsed,
+        'hands_per_second': num_rounds / elapsed,
+    }
+
+
+def bench_harness(path, num_rounds, repeat):
+    '''
+    Times games of the pokerbot at path against itself in its skeleton's in-process harness,
+    including building the pokerbots.
+    '''
+    bot_path = os.path.abspath(path)
+    isolated = lambda name: name in ('player', 'skeleton') or name.startswith('skeleton.')
+    saved_modules = {name: sys.modules.pop(name) for name in list(sys.modules) if isolated(name)}
+    saved_cwd = os.getcwd()
+    sys.path.insert(0, bot_path)
+    try:
+        # pokerbots load their tables from their own directory
+        os.chdir(bot_path)
+        harness = importlib.import_module('skeleton.harness')
+        player_class = importlib.import_module('player').Player
+        elapsed = best_of(repeat, lambda: harness.play(player_class(), player_class(), num_rounds, 0))
+    finally:
+        os.chdir(saved_cwd)
+        sys.path.remove(bot_path)
+        for name in [name for name in sys.modules if isolated(name)]:
+            del sys.modules[name]
+        sys.modules.update(saved_modules)
+    return {
+        'rounds': num_rounds,
+        'seconds': elapsed,
+        'hands_per_second': num_rounds / elapsed,
+    }
+
+
+def parse_args():
+    '''
+    Parses the benchmark configuration.
+    '''
+    parser = argparse.ArgumentParser(prog='python3 bench_engine.py')
+    parser.add_argument('--hands', type=int, default=5000, help='Number of recorded hands to replay')
+    parser.add_argument('--rounds', type=int, default=1000, help='Rounds per end-to-end game')
+    parser.add_argument('--repeat', type=int, default=5, help='Repeats per benchmark, the fastest is reported')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the recorded hands')
+    parser.add_argument('--bot', type=str, default='./allinbot', help='Pokerbot for the end-to-end games')
+    parser.add_argument('--skip-end-to-end', action='store_true', help='Only run the micro-benchmarks')
+    parser.add_argument('--out', type=str, default=None, help='Also write the results to this JSON file')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    recorded = record_hands(args.hands, args.seed)
+    results = {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'hands': args.hands,
+        'repeat': args.repeat,
+        'round_state': bench_round_state(recorded, args.repeat),
+        'logging': bench_logging(recorded, args.repeat),
+        'showdown': bench_showdown(recorded, args.repeat),
+        'runner': bench_runner(recorded, args.bot, args.repeat),
+    }
+    if not args.skip_end_to_end:
+        results['end_to_end'] = {
+            'socket': dict(bench_end_to_end(args.bot, args.rounds, False, args.repeat),
+                           transport=TRANSPORT, wire_protocol=WIRE_PROTOCOL),
+            'in_process': bench_end_to_end(args.bot, args.rounds, True, args.repeat),
+            'harness': bench_harness(args.bot, args.rounds, args.repeat),
+        }
+        end_to_end = results['end_to_end']
+        end_to_end['harness']['speedup_over_socket'] = (end_to_end['harness']['hands_per_second'] /
+                                                         end_to_end['socket']['hands_per_second'])
+    print(json.dumps(results, indent=4))
+    if args.out is not None:
+        with open(args.out, 'w') as results_file:
+            json.dump(results, results_file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+'''
+A content-addressed cache of pokerbot builds.
+
+A build is keyed by the SHA-256 digests of every file in the pokerbot directory
+and the build command. The cache keeps the files the build created or changed as
+blobs named by their digest, and the build's output, so a pokerbot whose directory
+is unchanged skips its build, and one whose outputs were removed gets them back.
+'''
+import hashlib
+import shutil
+import json
+import os
+
+# files in these directories change when pokerbots run, not when they are built
+SKIPPED_DIRS = ['__pycache__']
+
+
+def file_digests(path):
+    '''
+    Returns the SHA-256 digest of every file under path, by path relative to it.
+    Caches and hidden directories are skipped.
+    '''
+    digests = {}
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(name for name in dirs if name not in SKIPPED_DIRS and not name.startswith('.'))
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            digest = hashlib.sha256()
+            with open(file_path, 'rb') as bot_file:
+                for chunk in iter(lambda: bot_file.read(1 << 20), b''):
+                    digest.update(chunk)
+            digests[os.path.relpath(file_path, path)] = digest.hexdigest()
+    return digests
+
+
+def fingerprint(digests, command=()):
+    '''
+    Returns one digest of a directory's file digests and a command.
+    '''
+    contents = json.dumps([sorted(digests.items()), list(command)])
+    return hashlib.sha256(contents.encode()).hexdigest()
+
+
+class BuildCache():
+    '''
+    Stores builds under root: entries/<key>.json lists a build's output files and its
+    log, and objects/<digest> holds their contents. Every write is atomic, so matches
+    building the same pokerbot at once leave a consistent cache.
+    '''
+
+    def __init__(self, root):
+        self.root = root
+
+    def entry_name(self, key):
+        return os.path.join(self.root, 'entries', key + '.json')
+
+    def object_name(self, digest):
+        return os.path.join(self.root, 'objects', digest)
+
+    def replay(self, path, command):
+        '''
+        Restores the outputs of a cached build of path with command and returns the build's
+        output, or None if there is no such build. Also returns the directory's file digests,
+        which store needs after building.
+        '''
+        inputs = file_digests(path)
+        try:
+            with open(self.entry_name(fingerprint(inputs, command)), 'r') as entry_file:
+                entry = json.load(entry_file)
+            for name, (digest, mode) in entry['files'].items():
+                self.copy(self.object_name(digest), os.path.join(path, name), mode)
+            with open(self.object_name(entry['log']), 'rb') as log_file:
+                return log_file.read(), inputs
+        except (OSError, ValueError, KeyError):
+            return None, inputs
+
+    def store(self, path, command, inputs, output):
+        '''
+        Records a successful build of path: the files it created or changed and its output.
+        '''
+        try:
+            outputs = file_digests(path)
+            files = {}
+            for name, digest in outputs.items():
+                if inputs.get(name) != digest:
+                    file_name = os.path.join(path, name)
+                    mode = os.stat(file_name).st_mode & 0o777
+                    self.copy(file_name, self.object_name(digest), mode)
+                    files[name] = [digest, mode]
+            log_digest = hashlib.sha256(output).hexdigest()
+            self.write(self.object_name(log_digest), output)
+            self.write(self.entry_name(fingerprint(inputs, command)), json.dumps({'files': files, 'log': log_digest}).encode())
+            # the built directory has nothing to restore, so building it again is skipped too
+            self.write(self.entry_name(fingerprint(outputs, command)), json.dumps({'files': {}, 'log': log_digest}).encode())
+        except OSError as error:
+            # the cache only saves time, a build that cannot be stored still succeeded
+            print('Could not cache the build of', path + ':', error)
+
+    def copy(self, source, destination, mode):
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        temporary = '{}.{}.tmp'.format(destination, os.getpid())
+        shutil.copyfile(source, temporary)
+        os.chmod(temporary, mode)
+        os.replace(temporary, destination)
+
+    def write(self, name, contents):
+        os.makedirs(os.path.dirname(name), exist_ok=True)
+        temporary = '{}.{}.tmp'.format(name, os.getpid())
+        with open(temporary, 'wb') as cache_file:
+            cache_file.write(contents)
+        os.replace(temporary, name)
@@ -7,13 +7,57 @@ PLAYER_2_NAME = 'B'
 PLAYER_2_PATH = './Week4Bot'
 # GAME PROGRESS IS RECORDED HERE
 GAME_LOG_FILENAME = 'gamelog'
+# WRITE_GAME_LOG = False SKIPS RENDERING THE TEXT GAME LOG ENTIRELY, FOR THROUGHPUT RUNS
+WRITE_GAME_LOG = True
+# GAME_LOG_BUFFER_SIZE IS IN BYTES, THE LOG IS FLUSHED AFTER THE ROUND THAT FILLS IT
+# SET IT TO 0 TO FLUSH AFTER EVERY ROUND
+GAME_LOG_BUFFER_SIZE = 65536
+# COMPRESS_GAME_LOG WRITES GAME_LOG_FILENAME.txt.gz INSTEAD
+COMPRESS_GAME_LOG = False
+# WRITE_HAND_HISTORY ALSO RECORDS EVERY ROUND IN BINARY TO GAME_LOG_FILENAME.hh
+WRITE_HAND_HISTORY = False
+# WRITE_METRICS RECORDS EVERY QUERY'S LATENCY AND WRITES GAME_LOG_FILENAME_metrics.json
+WRITE_METRICS = False
 # PLAYER_LOG_SIZE_LIMIT IS IN BYTES
 PLAYER_LOG_SIZE_LIMIT = 524288
+# PLAYER_LOG_TAIL_SIZE BYTES OF OUTPUT PAST THE LIMIT ARE KEPT AND APPENDED TO THE LOG
+PLAYER_LOG_TAIL_SIZE = 65536
 # STARTING_GAME_CLOCK AND TIMEOUTS ARE IN SECONDS
 ENFORCE_GAME_CLOCK = True
 STARTING_GAME_CLOCK = 30.
 BUILD_TIMEOUT = 10.
 CONNECT_TIMEOUT = 10.
+# GAME_CLOCK_MODE IS 'wall' (ELAPSED TIME PER QUERY) OR 'cpu' (THE POKERBOT'S USER AND SYSTEM CPU TIME)
+# CPU TIME IS READ FROM /proc, WHERE IT IS NOT AVAILABLE WALL TIME IS CHARGED
+GAME_CLOCK_MODE = 'wall'
+# BUILD_CACHE_DIR KEEPS BUILD OUTPUTS BY A HASH OF THE POKERBOT DIRECTORY, SO UNCHANGED POKERBOTS SKIP THEIR BUILD
+# NONE BUILDS EVERY TIME
+BUILD_CACHE_DIR = '.build_cache'
+# BOT_LOG_LEVEL IS 'debug', 'info', 'warning' OR 'off' FOR POKERBOTS THAT LOG WITH skeleton/log.py
+# NONE LEAVES EACH POKERBOT AT ITS OWN LEVEL
+BOT_LOG_LEVEL = None
+# HEADLESS LOADS BOTH BOTS INTO THE ENGINE PROCESS INSTEAD OF RUNNING SUBPROCESSES
+# ABOUT 2.5 TIMES AS MANY HANDS PER SECOND AS SOCKETS FOR CHEAP BOTS, WHOSE RUNNERS THEN COST HALF OF EVERY HAND
+HEADLESS = False
+# WIRE_PROTOCOL IS 'text' OR 'binary', BOTS THAT DO NOT SUPPORT BINARY FALL BACK TO TEXT
+WIRE_PROTOCOL = 'text'
+# TRANSPORT IS 'tcp', 'unix' (A UNIX DOMAIN SOCKET) OR 'socketpair' (AN INHERITED FILE DESCRIPTOR)
+TRANSPORT = 'tcp'
+# SEED FIXES THE SEQUENCE OF DEALS, NONE PICKS A RANDOM SEED
+SEED = None
+# DUPLICATE REPLAYS EVERY DEAL WITH THE SEATS SWAPPED, USE AN EVEN NUM_ROUNDS
+DUPLICATE = False
+# DEAL_BLOCK_SIZE DEALS ARE GENERATED AT A TIME WITH NUMPY
+# 0, OR NO NUMPY, SHUFFLES A DECK EVERY ROUND, WHICH GIVES THE DEALS OF EARLIER VERSIONS FOR A SEED
+DEAL_BLOCK_SIZE = 4096
+# DEAL_FILE REPLAYS THE DEALS SAVED IN A FILE, SEE deals.py
+DEAL_FILE = None
+# SAVE_DEALS WRITES EVERY NEW DEAL TO GAME_LOG_FILENAME.deals
+SAVE_DEALS = False
+# CHECKPOINT_INTERVAL ROUNDS PASS BETWEEN CHECKPOINTS IN GAME_LOG_FILENAME_checkpoint.json, 0 DISABLES THEM
+CHECKPOINT_INTERVAL = 1000
+# RESUME CONTINUES THE GAME CHECKPOINTED IN THE LOG DIRECTORY WITH FRESH POKERBOT PROCESSES
+RESUME = False
 # THE GAME VARIANT FIXES THE PARAMETERS BELOW
 # CHANGE ONLY FOR TRAINING OR EXPERIMENTATION
 NUM_ROUNDS = 1000
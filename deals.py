@@ -0,0 +1,193 @@
+'''
+Pre-generated deals for the engine.
+
+A deal is the 11 cards of a deck that a round can use, as integer card ids
+(rank * 4 + suit, the order of eval7.Deck): the two hole cards of each player,
+the five board cards and the two auction cards at the bottom of the deck, in
+deck order. DealStream generates seeded blocks of deals with NumPy and deal files
+store them, so the exact deals of a game can be saved and replayed.
+'''
+import argparse
+import struct
+
+import eval7
+
+from handhistory import CARD_NAMES, card_id
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAGIC = b'PBDL'
+VERSION = 1
+HEADER = struct.Struct('<4sHH')
+# deck positions of the cards in a deal: hole cards, board, then the auction cards
+DEAL_POSITIONS = list(range(9)) + [50, 51]
+DEAL_SIZE = len(DEAL_POSITIONS)
+CARDS = [eval7.Card(name) for name in CARD_NAMES]
+
+
+class DealDeck():
+    '''
+    Stands in for eval7.Deck after the hole cards are dealt. RoundState peeks at the
+    board from the top and takes the auction cards from the bottom with peek(48).
+    '''
+    __slots__ = ['cards']
+
+    def __init__(self, cards):
+        self.cards = cards
+
+    def peek(self, n):
+        return self.cards[:n]
+
+
+def deck_from_deal(cards):
+    '''
+    Returns the hands and the deck of a deal given as eval7 cards.
+    '''
+    return [cards[0:2], cards[2:4]], DealDeck(cards[4:])
+
+
+class DealStream():
+    '''
+    Generates seeded deals in blocks with NumPy. The deals depend only on the seed, not on the block size.
+    '''
+
+    def __init__(self, seed, block_size):
+        if np is None:
+            raise ImportError('generating deal streams requires numpy')
+        self.rng = np.random.default_rng(seed)
+        self.block_size = block_size
+        self.block = []
+        self.block_state = self.rng.bit_generator.state
+        self.index = 0
+
+    def generate(self, size):
+        '''
+        Returns an array of size deals of card ids.
+        '''
+        decks = self.rng.permuted(np.tile(np.arange(52, dtype=np.uint8), (size, 1)), axis=1)
+        return decks[:, DEAL_POSITIONS]
+
+    def next_deal(self):
+        '''
+        Returns the next deal as eval7 cards, generating another block when this one runs out.
+        '''
+        if self.index == len(self.block):
+            self.block_state = self.rng.bit_generator.state
+            self.block = self.generate(self.block_size).tolist()
+            self.index = 0
+        deal = self.block[self.index]
+        self.index += 1
+        return [CARDS[card] for card in deal]
+
+    def getstate(self):
+        '''
+        Returns the position in the stream as JSON-compatible data: the generator state
+        before the current block, its size and the next deal in it.
+        '''
+        return {'block_state': self.block_state, 'block_size': len(self.block), 'index': self.index}
+
+    def setstate(self, state):
+        '''
+        Continues the stream from a position returned by getstate, regenerating the current block.
+        '''
+        self.rng.bit_generator.state = state['block_state']
+        self.block_state = state['block_state']
+        self.block = self.generate(state['block_size']).tolist() if state['block_size'] else []
+        self.index = state['index']
+
+
+class DealFile():
+    '''
+    Replays the deals saved in a deal file, in order.
+    '''
+
+    def __init__(self, name):
+        self.name = name
+        with open(name, 'rb') as deal_file:
+            magic, version, deal_size = HEADER.unpack(deal_file.read(HEADER.size))
+            if magic != MAGIC or version != VERSION or deal_size != DEAL_SIZE:
+                raise ValueError(name + ' is not a version ' + str(VERSION) + ' deal file')
+            self.deals = deal_file.read()
+        self.offset = 0
+
+    def __len__(self):
+        return len(self.deals) // DEAL_SIZE
+
+    def next_deal(self):
+        '''
+        Returns the next saved deal as eval7 cards.
+        '''
+        if self.offset + DEAL_SIZE > len(self.deals):
+            raise ValueError(self.name + ' has no more deals')
+        deal = self.deals[self.offset:self.offset + DEAL_SIZE]
+        self.offset += DEAL_SIZE
+        return [CARDS[card] for card in deal]
+
+    def getstate(self):
+        return {'offset': self.offset}
+
+    def setstate(self, state):
+        self.offset = state['offset']
+
+
+class DealWriter():
+    '''
+    Appends deals to a deal file.
+    '''
+
+    def __init__(self, name, offset=None):
+        if offset is None:
+            self.deal_file = open(name, 'wb')
+            self.deal_file.write(HEADER.pack(MAGIC, VERSION, DEAL_SIZE))
+        else:
+            # a resumed game drops the deals written after its checkpoint
+            self.deal_file = open(name, 'r+b')
+            self.deal_file.truncate(offset)
+            self.deal_file.seek(offset)
+
+    def write(self, cards):
+        '''
+        Writes one deal given as eval7 cards.
+        '''
+        self.deal_file.write(bytes(card_id(card) for card in cards))
+
+    def write_block(self, deals):
+        '''
+        Writes an array of deals of card ids.
+        '''
+        self.deal_file.write(np.ascontiguousarray(deals, dtype=np.uint8).tobytes())
+
+    def checkpoint(self):
+        '''
+        Writes the buffered deals and returns the size of the file.
+        '''
+        self.deal_file.flush()
+        return self.deal_file.tell()
+
+    def close(self):
+        self.deal_file.close()
+
+
+def parse_args():
+    '''
+    Parses the arguments for writing a deal file.
+    '''
+    parser = argparse.ArgumentParser(prog='python3 deals.py')
+    parser.add_argument('name', type=str, help='Deal file to write')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the deal stream')
+    parser.add_argument('--deals', type=int, default=1000, help='Number of deals to write')
+    parser.add_argument('--block-size', type=int, default=65536, help='Deals generated at a time')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    stream = DealStream(args.seed, args.block_size)
+    writer = DealWriter(args.name)
+    for start in range(0, args.deals, args.block_size):
+        writer.write_block(stream.generate(min(args.block_size, args.deals - start)))
+    writer.close()
+    print('Wrote', args.deals, 'deals with seed', args.seed, 'to', args.name)
@@ -19,18 +19,34 @@ each of the skeleton bot files accordingly
 '''
 
 from collections import namedtuple
-from threading import Thread
-from queue import Queue
+from contextlib import redirect_stdout
+from threading import Thread, Lock
+import traceback
+import importlib
+import random
+import struct
+import gzip
 import time
 import json
 import subprocess
+import tempfile
 import socket
+import shutil
 import eval7
 import sys
 import os
+import io
 
 sys.path.append(os.getcwd())
 from config import *
+from handhistory import HandHistoryWriter, CARD_NAMES, card_id
+from buildcache import BuildCache
+from deals import DealStream, DealFile, DealWriter, CARDS, deck_from_deal
+from metrics import LatencySample, street_label, write_metrics
+
+if BOT_LOG_LEVEL is not None:
+    # pokerbot subprocesses inherit it, and in-process pokerbots read it when they are imported
+    os.environ['POKERBOT_LOG_LEVEL'] = BOT_LOG_LEVEL
 
 FoldAction = namedtuple('FoldAction', [])
 CallAction = namedtuple('CallAction', [])
@@ -43,10 +59,43 @@ TerminalState = namedtuple('TerminalState', ['deltas', 'bids', 'previous_state']
 # will not include a "bid" street as a community card is not being revealed to the players
 STREET_NAMES = ['Flop', 'Turn', 'River']
 DECODE = {'F': FoldAction, 'C': CallAction, 'K': CheckAction, 'R': RaiseAction, 'A': BidAction}
+ENCODE = {action: code for code, action in DECODE.items()}
 CCARDS = lambda cards: ','.join(map(str, cards))
 PCARDS = lambda cards: '[{}]'.format(' '.join(map(str, cards)))
 PVALUE = lambda name, value: ', {} ({})'.format(name, value)
-STATUS = lambda players: ''.join([PVALUE(p.name, p.bankroll) for p in players])
+STANDINGS = lambda players: tuple((p.name, p.bankroll) for p in players)
+STATUS = lambda standings: ''.join([PVALUE(name, bankroll) for name, bankroll in standings])
+
+# Game log events are tuples of a renderer and its arguments. They are only
+# rendered to text when the log is written, and not at all when it is disabled.
+RENDER_ROUND = lambda round_num, standings: 'Round #' + str(round_num) + STATUS(standings)
+RENDER_FINAL = lambda standings: 'Final' + STATUS(standings)
+RENDER_BLIND = lambda name, amount: '{} posts the blind of {}'.format(name, amount)
+RENDER_DEALT = lambda name, cards: '{} dealt {}'.format(name, PCARDS(cards))
+RENDER_AUCTION = lambda name, card: '{} won the auction and was dealt [{}]'.format(name, card)
+RENDER_STREET = lambda street, board, name_0, pot_0, name_1, pot_1: (STREET_NAMES[street - 3] + ' ' + PCARDS(board) +
+                                                                     PVALUE(name_0, pot_0) + PVALUE(name_1, pot_1))
+RENDER_SHOWS = lambda name, cards: '{} shows {}'.format(name, PCARDS(cards))
+RENDER_AWARDED = lambda name, delta: '{} awarded {}'.format(name, delta)
+RENDER_BIDS = lambda bids: ('Players did not reach flop. No auction occured.' if None in bids else
+                            'Players submitted bids of {} and {}'.format(bids[0], bids[1]))
+
+
+def render_action(name, action, bet_override):
+    '''
+    Renders the game log line of an action.
+    '''
+    if isinstance(action, FoldAction):
+        phrasing = ' folds'
+    elif isinstance(action, CallAction):
+        phrasing = ' calls'
+    elif isinstance(action, CheckAction):
+        phrasing = ' checks'
+    elif isinstance(action, BidAction):
+        phrasing = ' bids ' + str(action.amount)
+    else:  # isinstance(action, RaiseAction)
+        phrasing = (' bets ' if bet_override else ' raises to ') + str(action.amount)
+    return name + phrasing
 
 # Socket encoding scheme:
 #
@@ -62,6 +111,7 @@ STATUS = lambda players: ''.join([PVALUE(p.name, p.bankroll) for p in players])
 # B**,**,**,**,** the board cards in common format
 # O**,** the opponent's hand in common format
 # D### the player's bankroll delta from the round
+# G a new game with the same pokerbot process, sent with its first message
 # Q game over
 #
 # Clauses are separated by spaces
@@ -69,12 +119,75 @@ STATUS = lambda players: ''.join([PVALUE(p.name, p.bankroll) for p in players])
 # The engine expects a response of K at the end of the round as an ack,
 # otherwise a response which encodes the player's action
 # Action history is sent once, including the player's actions
+#
+# With WIRE_PROTOCOL = 'binary' the engine offers a binary encoding of the same
+# clauses by sending V1 after connecting. Pokerbots that reply V1 switch to it,
+# any other reply keeps the text protocol. See skeleton/runner.py for the layout.
 
+WIRE_VERSION = 'V1'
+CARD_IDS = {name: card for card, name in enumerate(CARD_NAMES)}
+FRAME = struct.Struct('<H')
+DOUBLE = struct.Struct('<d')
+INT = struct.Struct('<i')
+STACKS_AND_BIDS = struct.Struct('<4i')
+RESPONSE = struct.Struct('<Bi')
+# CPU time of pokerbot processes is read from /proc/<pid>/stat, in clock ticks
+PROC_STAT = os.path.exists('/proc/self/stat')
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if PROC_STAT else 100
 
-class RoundState(namedtuple('_RoundState', ['button', 'street', 'auction', 'bids', 'pips', 'stacks', 'hands', 'deck', 'previous_state'])):
+
+def encode_binary(clauses, game_clock=None):
     '''
-    Encodes the game tree for one round of poker.
+    Encodes text clauses, preceded by the game clock if given, as one binary frame.
     '''
+    payload = bytearray()
+    if game_clock is not None:
+        payload += b'T' + DOUBLE.pack(game_clock)
+    for clause in clauses:
+        payload += clause[0].encode()
+        if clause[0] == 'P':
+            payload.append(int(clause[1:]))
+        elif clause[0] in 'RAD':
+            payload += INT.pack(int(clause[1:]))
+        elif clause[0] in 'HBON':
+            cards = clause[1:]
+            if clause[0] == 'N':
+                stacks, bids, cards = cards.split('_')
+                payload += STACKS_AND_BIDS.pack(*[int(x) for x in stacks.split(',') + bids.split(',')])
+            cards = [CARD_IDS[card] for card in cards.split(',')]
+            payload.append(len(cards))
+            payload += bytes(cards)
+    return FRAME.pack(len(payload)) + payload
+
+
+def decode_binary(response):
+    '''
+    Decodes a binary response into the equivalent text clause.
+    '''
+    if len(response) < RESPONSE.size:
+        return ''
+    code, amount = RESPONSE.unpack(response)
+    code = chr(code)
+    return code + str(amount) if code in ('R', 'A') else code
+
+
+class RoundState():
+    '''
+    Encodes the state of one round of poker. Actions update the state in place
+    and are appended to its action log, so a round allocates a single RoundState.
+    '''
+    __slots__ = ['button', 'street', 'auction', 'bids', 'pips', 'stacks', 'hands', 'deck', 'actions']
+
+    def __init__(self, button, street, auction, bids, pips, stacks, hands, deck):
+        self.button = button
+        self.street = street
+        self.auction = auction
+        self.bids = bids
+        self.pips = pips
+        self.stacks = stacks
+        self.hands = hands
+        self.deck = deck
+        self.actions = []
 
     def showdown(self):
         '''
@@ -133,36 +246,43 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'auction', 'bids
         '''
         if self.street == 5:
             return self.showdown()
+        self.button = 1
+        self.pips[0] = self.pips[1] = 0
         if self.street == 0:        # immediately after flop is dealt, we enter the auction
-            return RoundState(1, 3, True, self.bids, [0, 0], self.stacks, self.hands, self.deck, self)
-        # new_street = 3 if self.street == 0 else self.street + 1
-        # return RoundState(1, new_street, [0, 0], self.stacks, self.hands, self.deck, self)
-        return RoundState(1, self.street + 1, False, self.bids, [0, 0], self.stacks, self.hands, self.deck, self)
+            self.street = 3
+            self.auction = True
+        else:
+            self.street += 1
+        return self
 
     def proceed(self, action):
         '''
         Advances the game tree by one action performed by the active player.
+        Returns the same RoundState, or a TerminalState once the round is over.
         '''
+        self.actions.append(action)
         active = self.button % 2
         if isinstance(action, FoldAction):
             delta = self.stacks[0] - STARTING_STACK if active == 0 else STARTING_STACK - self.stacks[1]
             return TerminalState([delta, -delta], self.bids, self)
         if isinstance(action, CallAction):
             if self.button == 0:  # sb calls bb preflop
-                return RoundState(1, 0, self.auction, self.bids, [BIG_BLIND] * 2, [STARTING_STACK - BIG_BLIND] * 2, self.hands, self.deck, self)
+                self.button = 1
+                self.pips[0] = self.pips[1] = BIG_BLIND
+                self.stacks[0] = self.stacks[1] = STARTING_STACK - BIG_BLIND
+                return self
             # both players acted
-            new_pips = list(self.pips)
-            new_stacks = list(self.stacks)
-            contribution = new_pips[1-active] - new_pips[active]
-            new_stacks[active] -= contribution
-            new_pips[active] += contribution
-            state = RoundState(self.button + 1, self.street, self.auction, self.bids, new_pips, new_stacks, self.hands, self.deck, self)
-            return state.proceed_street()
+            contribution = self.pips[1-active] - self.pips[active]
+            self.stacks[active] -= contribution
+            self.pips[active] += contribution
+            self.button += 1
+            return self.proceed_street()
         if isinstance(action, CheckAction):
             if (self.street == 0 and self.button > 0) or self.button > 1:  # both players acted
                 return self.proceed_street()
             # let opponent act
-            return RoundState(self.button + 1, self.street, self.auction, self.bids, self.pips, self.stacks, self.hands, self.deck, self)
+            self.button += 1
+            return self
         if isinstance(action, BidAction):
             self.bids[active] = action.amount
             if None not in self.bids:       # both players have submitted bids and we deal the extra card
@@ -170,28 +290,97 @@ class RoundState(namedtuple('_RoundState', ['button', 'street', 'auction', 'bids
                 if self.bids[0] == self.bids[1]:
                     self.hands[0].append(self.deck.peek(48)[-1])
                     self.hands[1].append(self.deck.peek(48)[-2])
-                    new_stacks = list(self.stacks)
-                    new_stacks[0] -= self.bids[0]
-                    new_stacks[1] -= self.bids[1]
-                    state = RoundState(1, self.street, False, self.bids, self.pips, new_stacks, self.hands, self.deck, self)
+                    self.stacks[0] -= self.bids[0]
+                    self.stacks[1] -= self.bids[1]
                 else:
                 # case in which bids are not equal
                     winner = self.bids.index(max(self.bids))
                     self.hands[winner].append(self.deck.peek(48)[-1])
-                    new_stacks = list(self.stacks)
-                    new_stacks[winner] -= self.bids[1 - winner]
-                    state = RoundState(1, self.street, False, self.bids, self.pips, new_stacks, self.hands, self.deck, self)
-                return state
+                    self.stacks[winner] -= self.bids[1 - winner]
+                self.button = 1
+                self.auction = False
             else:
-                return RoundState(self.button + 1, self.street, True, self.bids, self.pips, self.stacks, self.hands, self.deck, self)
+                self.button += 1
+            return self
         if isinstance(action, RaiseAction):
-            new_pips = list(self.pips)
-            new_stacks = list(self.stacks)
-            contribution = action.amount - new_pips[active]
-            new_stacks[active] -= contribution
-            new_pips[active] += contribution
-            return RoundState(self.button + 1, self.street, self.auction, self.bids, new_pips, new_stacks, self.hands, self.deck, self)
+            contribution = action.amount - self.pips[active]
+            self.stacks[active] -= contribution
+            self.pips[active] += contribution
+            self.button += 1
+            return self
+
+
+
+class PlayerLog():
+    '''
+    Streams a pokerbot's output to its log file as it arrives. Output past the size
+    limit is not stored, except for a bounded tail that is appended when the log closes.
+    '''
+
+    def __init__(self, name, size_limit, tail_size, append=False):
+        self.size_limit = size_limit
+        self.tail_size = tail_size
+        self.lock = Lock()
+        self.log_file = None
+        self.open(name, append)
+
+    def open(self, name, append=False):
+        '''
+        Starts a new log file, or continues an existing one, which counts toward the size limit.
+        '''
+        with self.lock:
+            self.log_file = open(name, 'ab' if append else 'wb')
+            self.bytes_written = self.log_file.tell()
+            self.bytes_seen = self.bytes_written
+            self.tail = bytearray()
+
+    def write(self, output):
+        '''
+        Adds output, as bytes or text, to the log. Output after the log closes is ignored.
+        '''
+        if not output:
+            return
+        if isinstance(output, str):
+            output = output.encode()
+        with self.lock:
+            if self.log_file is None:
+                return
+            self.bytes_seen += len(output)
+            if self.bytes_written < self.size_limit:
+                head = output[:self.size_limit - self.bytes_written]
+                self.bytes_written += self.log_file.write(head)
+                output = output[len(head):]
+            if output:
+                self.tail += output
+                # trim in bulk so the ring buffer costs amortized constant time per byte
+                if len(self.tail) > 2 * self.tail_size:
+                    del self.tail[:len(self.tail) - self.tail_size]
+
+    def flush(self):
+        with self.lock:
+            if self.log_file is not None:
+                self.log_file.flush()
+
+    @property
+    def dropped(self):
+        '''
+        The number of bytes that are in neither the head nor the tail of the log.
+        '''
+        return self.bytes_seen - self.bytes_written - min(len(self.tail), self.tail_size)
 
+    def close(self):
+        '''
+        Appends the tail, marking how much output was dropped before it, and closes the log file.
+        '''
+        with self.lock:
+            if self.log_file is None:
+                return
+            if self.tail:
+                if self.dropped:
+                    self.log_file.write('\n[{} bytes dropped]\n'.format(self.dropped).encode())
+                self.log_file.write(self.tail[-self.tail_size:] if self.tail_size else b'')
+            self.log_file.close()
+            self.log_file = None
 
 
 class Player():
@@ -199,20 +388,60 @@ class Player():
     Handles subprocess and socket interactions with one player's pokerbot.
     '''
 
-    def __init__(self, name, path):
+    def __init__(self, name, path, log_dir='.', append_log=False):
         self.name = name
         self.path = path
+        self.log_filename = os.path.join(log_dir, name + '.txt')
         self.game_clock = STARTING_GAME_CLOCK
         self.bankroll = 0
         self.commands = None
         self.bot_subprocess = None
         self.socketfile = None
-        self.bytes_queue = Queue()
+        self.binary = False
+        self.player_log = PlayerLog(self.log_filename, PLAYER_LOG_SIZE_LIMIT, PLAYER_LOG_TAIL_SIZE, append_log)
+        self.response_time = 0.
+        self.cpu_response_time = None
+        self.cpu_seen = 0.
+        self.stat_fd = None
+        self.round_num = 0
+        self.latencies = []
+        self.new_game = False
+        self.env = None
 
     def build(self):
         '''
         Loads the commands file and builds the pokerbot.
         '''
+        self.load_commands()
+        if self.commands is not None and len(self.commands['build']) > 0:
+            build_cache = BuildCache(BUILD_CACHE_DIR) if BUILD_CACHE_DIR is not None else None
+            try:
+                if build_cache is not None:
+                    output, inputs = build_cache.replay(self.path, self.commands['build'])
+                    if output is not None:
+                        print(self.name, 'is unchanged, using its cached build')
+                        self.player_log.write(output)
+                        return
+                proc = subprocess.run(self.commands['build'],
+                                      stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                      cwd=self.path, timeout=BUILD_TIMEOUT, check=False)
+                self.player_log.write(proc.stdout)
+                if build_cache is not None and proc.returncode == 0:
+                    build_cache.store(self.path, self.commands['build'], inputs, proc.stdout)
+            except subprocess.TimeoutExpired as timeout_expired:
+                error_message = 'Timed out waiting for ' + self.name + ' to build'
+                print(error_message)
+                self.player_log.write(timeout_expired.stdout)
+                self.player_log.write(error_message)
+            except (TypeError, ValueError):
+                print(self.name, 'build command misformatted')
+            except OSError:
+                print(self.name, 'build failed - check "build" in commands.json')
+
+    def load_commands(self):
+        '''
+        Loads the build and run commands from the pokerbot's commands file.
+        '''
         try:
             with open(self.path + '/commands.json', 'r') as json_file:
                 commands = json.load(json_file)
@@ -226,60 +455,90 @@ class Player():
             print(self.name, 'commands.json not found - check PLAYER_PATH')
         except json.decoder.JSONDecodeError:
             print(self.name, 'commands.json misformatted')
-        if self.commands is not None and len(self.commands['build']) > 0:
-            try:
-                proc = subprocess.run(self.commands['build'],
-                                      stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                      cwd=self.path, timeout=BUILD_TIMEOUT, check=False)
-                self.bytes_queue.put(proc.stdout)
-            except subprocess.TimeoutExpired as timeout_expired:
-                error_message = 'Timed out waiting for ' + self.name + ' to build'
-                print(error_message)
-                self.bytes_queue.put(timeout_expired.stdout)
-                self.bytes_queue.put(error_message.encode())
-            except (TypeError, ValueError):
-                print(self.name, 'build command misformatted')
-            except OSError:
-                print(self.name, 'build failed - check "build" in commands.json')
 
     def run(self):
         '''
         Runs the pokerbot and establishes the socket connection.
         '''
         if self.commands is not None and len(self.commands['run']) > 0:
+            socket_dir = None
             try:
-                server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                if TRANSPORT == 'socketpair':
+                    # the pokerbot inherits its end of a connected pair, so there is nothing to accept
+                    client_socket, bot_socket = socket.socketpair()
+                    with bot_socket:
+                        self.start(['--fd', str(bot_socket.fileno())], (bot_socket.fileno(),))
+                    self.connect(client_socket)
+                    return
+                if TRANSPORT == 'unix':
+                    socket_dir = tempfile.mkdtemp(prefix='pokerbots-')
+                    address = os.path.join(socket_dir, self.name + '.sock')
+                    server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                else:
+                    address = ('', 0)
+                    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                 with server_socket:
-                    server_socket.bind(('', 0))
+                    server_socket.bind(address)
                     server_socket.settimeout(CONNECT_TIMEOUT)
                     server_socket.listen()
-                    port = server_socket.getsockname()[1]
-                    proc = subprocess.Popen(self.commands['run'] + [str(port)],
-                                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                                            cwd=self.path)
-                    self.bot_subprocess = proc
-                    # function for bot listening
-                    def enqueue_output(out, queue):
-                        try:
-                            for line in out:
-                                queue.put(line)
-                        except ValueError:
-                            pass
-                    # start a separate bot listening thread which dies with the program
-                    Thread(target=enqueue_output, args=(proc.stdout, self.bytes_queue), daemon=True).start()
+                    if TRANSPORT == 'unix':
+                        self.start(['--unix', address])
+                    else:
+                        self.start([str(server_socket.getsockname()[1])])
                     # block until we timeout or the player connects
                     client_socket, _ = server_socket.accept()
-                    with client_socket:
-                        client_socket.settimeout(CONNECT_TIMEOUT)
-                        sock = client_socket.makefile('rw')
-                        self.socketfile = sock
-                        print(self.name, 'connected successfully')
+                    self.connect(client_socket)
             except (TypeError, ValueError):
                 print(self.name, 'run command misformatted')
             except OSError:
                 print(self.name, 'run failed - check "run" in commands.json')
             except socket.timeout:
                 print('Timed out waiting for', self.name, 'to connect')
+            finally:
+                if socket_dir is not None:
+                    shutil.rmtree(socket_dir, ignore_errors=True)
+
+    def start(self, arguments, pass_fds=()):
+        '''
+        Starts the pokerbot subprocess and a thread that collects its output.
+        '''
+        proc = subprocess.Popen(self.commands['run'] + arguments,
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                cwd=self.path, pass_fds=pass_fds, env=self.env)
+        self.bot_subprocess = proc
+        # function for bot listening
+        def enqueue_output(out, player_log):
+            try:
+                for line in out:
+                    player_log.write(line)
+            except ValueError:
+                pass
+        # start a separate bot listening thread which dies with the program
+        Thread(target=enqueue_output, args=(proc.stdout, self.player_log), daemon=True).start()
+
+    def connect(self, client_socket):
+        '''
+        Wraps the connected socket in a file and negotiates the wire protocol.
+        '''
+        with client_socket:
+            client_socket.settimeout(CONNECT_TIMEOUT)
+            sock = client_socket.makefile('rw')
+            self.socketfile = sock
+            if WIRE_PROTOCOL == 'binary':
+                self.negotiate()
+            print(self.name, 'connected successfully' + (' (binary)' if self.binary else ''))
+            self.start_cpu_clock()
+
+    def negotiate(self):
+        '''
+        Offers the binary protocol. Pokerbots that do not accept it keep the text protocol.
+        '''
+        self.socketfile.write(WIRE_VERSION + '\n')
+        self.socketfile.flush()
+        if self.socketfile.readline().strip() == WIRE_VERSION:
+            # the pokerbot waits for our next message, so no text is left buffered
+            self.socketfile = self.socketfile.detach()
+            self.binary = True
 
     def stop(self):
         '''
@@ -287,7 +546,7 @@ class Player():
         '''
         if self.socketfile is not None:
             try:
-                self.socketfile.write('Q\n')
+                self.socketfile.write(encode_binary(['Q']) if self.binary else 'Q\n')
                 self.socketfile.close()
             except socket.timeout:
                 print('Timed out waiting for', self.name, 'to disconnect')
@@ -296,21 +555,50 @@ class Player():
         if self.bot_subprocess is not None:
             try:
                 outs, _ = self.bot_subprocess.communicate(timeout=CONNECT_TIMEOUT)
-                self.bytes_queue.put(outs)
+                self.player_log.write(outs)
             except subprocess.TimeoutExpired:
                 print('Timed out waiting for', self.name, 'to quit')
                 self.bot_subprocess.kill()
                 outs, _ = self.bot_subprocess.communicate()
-                self.bytes_queue.put(outs)
-        with open(self.name + '.txt', 'wb') as log_file:
-            bytes_written = 0
-            for output in self.bytes_queue.queue:
-                try:
-                    bytes_written += log_file.write(output)
-                    if bytes_written >= PLAYER_LOG_SIZE_LIMIT:
-                        break
-                except TypeError:
-                    pass
+                self.player_log.write(outs)
+        self.close_stat()
+        self.close_log()
+
+    def reset(self, log_dir):
+        '''
+        Prepares a pokerbot that is still running for another game.
+        '''
+        self.log_filename = os.path.join(log_dir, self.name + '.txt')
+        self.game_clock = STARTING_GAME_CLOCK
+        self.bankroll = 0
+        self.round_num = 0
+        self.latencies = []
+        self.new_game = True
+        self.close_log()
+        self.player_log.open(self.log_filename)
+
+    def alive(self):
+        '''
+        Returns whether the pokerbot can play another game without restarting.
+        '''
+        # a timed out pokerbot may still owe us a response, so it is never reused
+        return (self.socketfile is not None and self.game_clock > 0. and
+                self.bot_subprocess is not None and self.bot_subprocess.poll() is None)
+
+    def finish(self):
+        '''
+        Flushes the output of a finished game while the pokerbot keeps running.
+        Output that arrives before the next game, e.g. at shutdown, still goes to this game's log.
+        '''
+        self.player_log.flush()
+
+    def close_log(self):
+        '''
+        Finishes the pokerbot's log file and reports how much output did not fit.
+        '''
+        self.player_log.close()
+        if self.player_log.dropped:
+            print(self.name, 'log exceeded PLAYER_LOG_SIZE_LIMIT,', self.player_log.dropped, 'bytes dropped')
 
     def query(self, round_state, player_message, game_log):
         '''
@@ -318,78 +606,488 @@ class Player():
         At the end of the round, we request a CheckAction from the pokerbot.
         '''
         legal_actions = round_state.legal_actions() if isinstance(round_state, RoundState) else {CheckAction}
+        self.response_time = 0.
         if self.socketfile is not None and self.game_clock > 0.:
             clause = ''
             try:
-                player_message[0] = 'T{:.3f}'.format(self.game_clock)
-                message = ' '.join(player_message) + '\n'
-                del player_message[1:]  # do not send redundant action history
+                message = self.encode_message(player_message)
+                self.start_cpu_sample()
                 start_time = time.perf_counter()
                 self.socketfile.write(message)
                 self.socketfile.flush()
-                clause = self.socketfile.readline().strip()
-                end_time = time.perf_counter()
-                if ENFORCE_GAME_CLOCK:
-                    self.game_clock -= end_time - start_time
-                if self.game_clock <= 0.:
-                    raise socket.timeout
-                action = DECODE[clause[0]]
-                if action in legal_actions:
-                    if clause[0] == 'R':
-                        amount = int(clause[1:])
-                        min_raise, max_raise = round_state.raise_bounds()
-                        if min_raise <= amount <= max_raise:
-                            return action(amount)
-                    elif clause[0] == 'A':
-                        amount = int(clause[1:])
-                        min_bid, max_bid = round_state.bid_bounds()
-                        if min_bid <= amount <= max_bid:
-                            return action(amount)
-                    else:
-                        return action()
-                if clause[0] in ('R', 'A'):
-                    game_log.append(self.name + ' attempted illegal ' + action.__name__ + ' with amount ' + str(int(clause[1:])))
+                if self.binary:
+                    clause = decode_binary(self.socketfile.read(RESPONSE.size))
                 else:
-                    game_log.append(self.name + ' attempted illegal ' + action.__name__)
-
+                    clause = self.socketfile.readline().strip()
+                end_time = time.perf_counter()
+                self.charge(end_time - start_time, round_state, legal_actions)
+                action = self.decode_action(clause, round_state, legal_actions, game_log)
+                if action is not None:
+                    return action
             except socket.timeout:
-                error_message = self.name + ' ran out of time'
-                game_log.append(error_message)
-                print(error_message)
-                self.game_clock = 0.
+                self.disconnect(self.name + ' ran out of time', game_log)
             except OSError:
-                error_message = self.name + ' disconnected'
-                game_log.append(error_message)
-                print(error_message)
-                self.game_clock = 0.
-            # except (IndexError, KeyError, ValueError):
-            #     # TODO: responses are being misformatted when running game
-            #     game_log.append(self.name + ' response misformatted: ' + str(clause))
-            except IndexError:
-                # TODO: responses are being misformatted when running game
-                game_log.append(self.name + ' response misformatted: ' + str(clause))
-                game_log.append('IndexError')
-            except KeyError:
-                # TODO: responses are being misformatted when running game
-                game_log.append(self.name + ' response misformatted: ' + str(clause))
-                game_log.append('KeyError')
-            except ValueError:
-                # TODO: responses are being misformatted when running game
-                game_log.append(self.name + ' response misformatted: ' + str(clause))
-                game_log.append('ValueError')
+                self.disconnect(self.name + ' disconnected', game_log)
+            except (IndexError, KeyError, ValueError) as error:
+                self.misformatted(clause, error, game_log)
+        return self.default_action(legal_actions)
+
+    def encode_message(self, player_message):
+        '''
+        Encodes the pending clauses for the pokerbot, preceded by its game clock, and clears them.
+        '''
+        if self.new_game:
+            player_message.insert(1, 'G')
+        if self.binary:
+            message = encode_binary(player_message[1:], self.game_clock)
+        else:
+            player_message[0] = 'T{:.3f}'.format(self.game_clock)
+            message = ' '.join(player_message) + '\n'
+        del player_message[1:]  # do not send redundant action history
+        self.new_game = False
+        return message
+
+    def charge(self, response_time, round_state, legal_actions):
+        '''
+        Records the response time of the last query and charges it, or the CPU time the
+        pokerbot used to answer it, to the game clock.
+        '''
+        self.response_time = response_time
+        if WRITE_METRICS or GAME_CLOCK_MODE == 'cpu':
+            self.cpu_response_time = self.sample_cpu_time()
+        if WRITE_METRICS:
+            self.record_latency(round_state, legal_actions)
+        if ENFORCE_GAME_CLOCK:
+            if GAME_CLOCK_MODE == 'cpu' and self.cpu_response_time is not None:
+                self.game_clock -= self.cpu_response_time
+            else:
+                self.game_clock -= self.response_time
+        if self.game_clock <= 0.:
+            raise socket.timeout
+
+    def cpu_time(self):
+        '''
+        Returns the user and system CPU time of the pokerbot process in seconds, at the
+        resolution of a clock tick, or None where /proc is not available.
+        '''
+        if not PROC_STAT or self.bot_subprocess is None:
+            return None
+        try:
+            if self.stat_fd is None:
+                self.stat_fd = os.open('/proc/{}/stat'.format(self.bot_subprocess.pid), os.O_RDONLY)
+            stat = os.pread(self.stat_fd, 1024, 0)
+        except OSError:
+            return None
+        # the command name may contain spaces, so fields are counted from the parenthesis that ends it
+        fields = stat[stat.rindex(b')') + 2:].split()
+        return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+    def start_cpu_clock(self):
+        '''
+        Starts counting CPU time from now, so start-up work is not charged.
+        '''
+        cpu_time = self.cpu_time()
+        self.cpu_seen = cpu_time if cpu_time is not None else 0.
+        if GAME_CLOCK_MODE == 'cpu' and cpu_time is None:
+            print(self.name, 'CPU time is not available, charging wall time')
+
+    def start_cpu_sample(self):
+        '''
+        Starts the next CPU time sample as a query is sent, so the CPU time the pokerbot uses
+        between queries, e.g. pondering on the opponent's time, is not charged.
+        '''
+        if WRITE_METRICS or GAME_CLOCK_MODE == 'cpu':
+            cpu_time = self.cpu_time()
+            if cpu_time is not None:
+                self.cpu_seen = cpu_time
+
+    def sample_cpu_time(self):
+        '''
+        Returns the CPU time the pokerbot used since the sample started, or None if it cannot be measured.
+        '''
+        cpu_time = self.cpu_time()
+        if cpu_time is None:
+            return None
+        used = cpu_time - self.cpu_seen
+        self.cpu_seen = cpu_time
+        return used
+
+    def close_stat(self):
+        if self.stat_fd is not None:
+            os.close(self.stat_fd)
+            self.stat_fd = None
+
+    def decode_action(self, clause, round_state, legal_actions, game_log):
+        '''
+        Returns the action a response encodes, or None if it is illegal.
+        Raises IndexError, KeyError or ValueError if it is misformatted.
+        '''
+        action = DECODE[clause[0]]
+        if action in legal_actions:
+            if clause[0] == 'R':
+                amount = int(clause[1:])
+                min_raise, max_raise = round_state.raise_bounds()
+                if min_raise <= amount <= max_raise:
+                    return action(amount)
+            elif clause[0] == 'A':
+                amount = int(clause[1:])
+                min_bid, max_bid = round_state.bid_bounds()
+                if min_bid <= amount <= max_bid:
+                    return action(amount)
+            else:
+                return action()
+        if clause[0] in ('R', 'A'):
+            game_log.append(self.name + ' attempted illegal ' + action.__name__ + ' with amount ' + str(int(clause[1:])))
+        else:
+            game_log.append(self.name + ' attempted illegal ' + action.__name__)
+        return None
+
+    def misformatted(self, clause, error, game_log):
+        '''
+        Logs a response that could not be decoded.
+        '''
+        # TODO: responses are being misformatted when running game
+        game_log.append(self.name + ' response misformatted: ' + str(clause))
+        game_log.append(type(error).__name__)
+
+    def disconnect(self, error_message, game_log):
+        '''
+        Logs why the pokerbot stopped responding and forfeits its remaining game clock.
+        '''
+        game_log.append(error_message)
+        print(error_message)
+        self.game_clock = 0.
+
+    @staticmethod
+    def default_action(legal_actions):
+        '''
+        Returns the action taken for a pokerbot that fails to submit a legal one.
+        '''
         # set a base bid action of 0 if pokerbot fails to submit legal bid action
         if BidAction in legal_actions:
             return BidAction(0)
         return CheckAction() if CheckAction in legal_actions else FoldAction()
 
+    def record_latency(self, round_state, legal_actions):
+        '''
+        Records the latency of the last query, tagged with the round, street and decision.
+        '''
+        if isinstance(round_state, TerminalState):
+            street, decision, ack = street_label(round_state.previous_state), 'ack', True
+        else:
+            street, decision, ack = street_label(round_state), ''.join(sorted(ENCODE[action] for action in legal_actions)), False
+        self.latencies.append(LatencySample(self.round_num, street, decision, ack, self.response_time, self.cpu_response_time))
+
+
+class LocalChannel():
+    '''
+    In-memory stand-in for the socket file between the engine and an in-process pokerbot.
+    Messages are lists of text clauses, handed to the pokerbot's Runner without encoding them.
+    '''
+
+    def __init__(self, runner_class, pokerbot, output):
+        self.packet = None
+        self.response = io.StringIO()
+        self.output = output
+        self.closed = False
+        # CPU time of the engine process while the pokerbot handles messages
+        self.cpu_time = 0.
+        # the pokerbot's Runner writes its responses into its own end of the channel
+        self.runner = runner_class(pokerbot, self.response)
+        # a pondering thread in the engine process would be charged to whoever is moving
+        self.runner.ponderer = None
+        # skeletons without the single-pass text path decode each message first
+        self.handle_text = getattr(self.runner, 'handle_text', None) or (
+            lambda packet: self.runner.handle_packet(self.runner.parse_text(packet)))
+
+    def write(self, packet):
+        '''
+        Queues a list of clauses for the pokerbot.
+        '''
+        if self.closed:
+            raise OSError('channel closed')
+        self.packet = packet
+
+    def flush(self):
+        pass
+
+    def readline(self):
+        '''
+        Delivers the pending message to the pokerbot's Runner and returns its response.
+        '''
+        if self.closed:
+            raise OSError('channel closed')
+        packet = self.packet
+        self.packet = None
+        start_time = time.process_time()
+        try:
+            with redirect_stdout(self.output):
+                self.handle_text(packet)
+        except Exception:
+            self.output.write(traceback.format_exc())
+            self.closed = True
+            raise OSError('pokerbot raised an exception')
+        finally:
+            self.cpu_time += time.process_time() - start_time
+        response = self.response.getvalue()
+        self.response.seek(0)
+        self.response.truncate()
+        return response
+
+    def close(self):
+        '''
+        Delivers any pending game over message, closes the Runner and closes the channel.
+        '''
+        if not self.closed and self.packet:
+            try:
+                with redirect_stdout(self.output):
+                    self.handle_text(self.packet)
+            except Exception:
+                self.output.write(traceback.format_exc())
+        # a pokerbot that never saw the game end still has its log thread running
+        close = getattr(self.runner, 'close', None)
+        if close is not None:
+            try:
+                with redirect_stdout(self.output):
+                    close()
+            except Exception:
+                self.output.write(traceback.format_exc())
+        self.closed = True
+
+
+class InProcessPlayer(Player):
+    '''
+    Runs one player's pokerbot inside the engine process for headless matches.
+    '''
+
+    def run(self):
+        '''
+        Imports the pokerbot's Player class and connects it through an in-memory channel.
+        '''
+        if self.commands is not None and len(self.commands['run']) > 0:
+            scripts = [arg for arg in self.commands['run'] if arg.endswith('.py')]
+            if not scripts:
+                print(self.name, 'run command has no Python script - cannot run headless')
+                return
+            bot_path = os.path.abspath(self.path)
+            module_name = os.path.splitext(os.path.basename(scripts[0]))[0]
+            # every pokerbot ships its own skeleton package, so each import gets a clean slate
+            isolated = lambda name: name in (module_name, 'skeleton') or name.startswith('skeleton.')
+            saved_modules = {name: sys.modules.pop(name) for name in list(sys.modules) if isolated(name)}
+            saved_cwd = os.getcwd()
+            sys.path.insert(0, bot_path)
+            try:
+                os.chdir(bot_path)
+                with redirect_stdout(self.player_log):
+                    module = importlib.import_module(module_name)
+                    runner_class = importlib.import_module('skeleton.runner').Runner
+                    pokerbot = module.Player()
+                self.socketfile = LocalChannel(runner_class, pokerbot, self.player_log)
+                print(self.name, 'loaded successfully')
+            except Exception:
+                self.player_log.write(traceback.format_exc())
+                print(self.name, 'failed to load - check', self.path + '/' + scripts[0])
+            finally:
+                os.chdir(saved_cwd)
+                sys.path.remove(bot_path)
+                for name in [name for name in sys.modules if isolated(name)]:
+                    del sys.modules[name]
+                sys.modules.update(saved_modules)
+
+    def stop(self):
+        '''
+        Ends the game for the in-process pokerbot and closes its log.
+        '''
+        if self.socketfile is not None and not self.socketfile.closed:
+            self.socketfile.write(['Q'])
+            self.socketfile.close()
+        self.close_log()
+
+    def alive(self):
+        return self.socketfile is not None and not self.socketfile.closed and self.game_clock > 0.
+
+    def encode_message(self, player_message):
+        '''
+        Returns the pending clauses, preceded by the game clock, as the list the pokerbot's Runner
+        reads, and clears them.
+        '''
+        if self.new_game:
+            player_message.insert(1, 'G')
+        player_message[0] = 'T{:.3f}'.format(self.game_clock)
+        packet = player_message[:]
+        del player_message[1:]  # do not send redundant action history
+        self.new_game = False
+        return packet
+
+    def cpu_time(self):
+        '''
+        Returns the CPU time the engine process spent in the pokerbot's message handling.
+        '''
+        return self.socketfile.cpu_time if self.socketfile is not None else None
+
+
+class PlayerPool():
+    '''
+    Keeps pokerbots running between games, so each one is built and connected only once.
+    '''
+
+    def __init__(self, player_class=Player):
+        self.player_class = player_class
+        self.idle = {}
+
+    def acquire(self, name, path, log_dir='.'):
+        '''
+        Returns a running pokerbot for a new game, starting one if none is idle.
+        '''
+        player = self.idle.pop((name, path), None)
+        if player is not None:
+            player.reset(log_dir)
+            return player
+        player = self.player_class(name, path, log_dir)
+        # unbuffered output keeps each game's prints in that game's log
+        player.env = dict(os.environ, PYTHONUNBUFFERED='1')
+        player.build()
+        player.run()
+        return player
+
+    def release(self, player):
+        '''
+        Writes the player's log for the finished game and keeps the pokerbot for the next one.
+        '''
+        if player.alive():
+            player.finish()
+            self.idle[(player.name, player.path)] = player
+        else:
+            player.stop()
+
+    def close(self):
+        '''
+        Stops every idle pokerbot.
+        '''
+        for player in self.idle.values():
+            player.stop()
+        self.idle.clear()
+
+
+class GameLog():
+    '''
+    Buffers game log lines and events and streams them to disk in the gamelog text format.
+    A log without a name is disabled and ignores everything.
+    '''
+    # events are counted against the buffer size as lines of a typical length
+    EVENT_SIZE = 24
+
+    def __init__(self, name, buffer_size, compress, offset=None):
+        self.name = name
+        self.compress = compress
+        self.log_file = None
+        self.separator = ''
+        if name is not None:
+            if offset is None:
+                self.log_file = gzip.open(name, 'wt') if compress else open(name, 'w')
+            else:
+                # a resumed game drops the lines written after its checkpoint
+                os.truncate(name, offset)
+                self.log_file = gzip.open(name, 'at') if compress else open(name, 'a')
+                self.separator = '\n' if offset else ''
+        self.buffer_size = buffer_size
+        self.lines = []
+        self.buffered = 0
+
+    def append(self, line):
+        '''
+        Adds one line of text to the log.
+        '''
+        if self.log_file is not None:
+            self.lines.append(line)
+            self.buffered += len(line) + 1
+
+    def event(self, render, *args):
+        '''
+        Adds one line to the log that is rendered as render(*args) when it is written.
+        '''
+        if self.log_file is not None:
+            self.lines.append((render, args))
+            self.buffered += self.EVENT_SIZE
+
+    def end_round(self):
+        '''
+        Flushes the buffered lines once they exceed the buffer size.
+        '''
+        if self.buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        '''
+        Writes the buffered lines to disk.
+        '''
+        if self.log_file is None:
+            return
+        if self.lines:
+            lines = [line if line.__class__ is str else line[0](*line[1]) for line in self.lines]
+            # lines are joined by newlines with no trailing newline, as in a single write
+            self.log_file.write(self.separator + '\n'.join(lines))
+            self.separator = '\n'
+            self.lines.clear()
+            self.buffered = 0
+        self.log_file.flush()
+
+    def checkpoint(self):
+        '''
+        Writes the buffered lines and returns the size of the log file, or None if it is disabled.
+        '''
+        if self.log_file is None:
+            return None
+        self.flush()
+        if self.compress:
+            # end the gzip member, so the file up to here decompresses on its own
+            self.log_file.close()
+            self.log_file = gzip.open(self.name, 'at')
+        return os.path.getsize(self.name)
+
+    def close(self):
+        '''
+        Writes any buffered lines and closes the log file.
+        '''
+        if self.log_file is not None:
+            self.flush()
+            self.log_file.close()
+
+
+# format of the checkpoint files written every CHECKPOINT_INTERVAL rounds
+CHECKPOINT_VERSION = 1
+
 
 class Game():
     '''
     Manages logging and the high-level game procedure.
     '''
 
-    def __init__(self):
-        self.log = ['6.9630 MIT Pokerbots - ' + PLAYER_1_NAME + ' vs ' + PLAYER_2_NAME]
+    def __init__(self, player_1=(PLAYER_1_NAME, PLAYER_1_PATH), player_2=(PLAYER_2_NAME, PLAYER_2_PATH),
+                 num_rounds=NUM_ROUNDS, log_dir='.', headless=HEADLESS, seed=SEED, duplicate=DUPLICATE, pool=None,
+                 resume=RESUME):
+        self.player_specs = [player_1, player_2]
+        self.num_rounds = num_rounds
+        self.log_dir = log_dir
+        self.headless = headless
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
+        self.duplicate = duplicate
+        self.pool = pool
+        self.resume = resume
+        self.deals = None
+        if DEAL_FILE is not None:
+            self.deals = DealFile(DEAL_FILE)
+        elif DEAL_BLOCK_SIZE > 0:
+            try:
+                self.deals = DealStream(self.seed, DEAL_BLOCK_SIZE)
+            except ImportError:
+                pass  # without numpy every round shuffles a deck
+        self.deal_writer = None
+        self.dealt_cards = None
+        self.round_num = 0
+        self.log = None
+        self.hand_history = None
         self.player_messages = [[], []]
 
     def log_round_state(self, players, round_state):
@@ -400,25 +1098,25 @@ class Game():
         if round_state.street == 3 and round_state.auction is False and round_state.button == 1:
             for i in range(2):
                 if len(round_state.hands[i]) > 2:
-                    new_cards = PCARDS(round_state.hands[i]).split(" ")
-                    self.log.append('{} won the auction and was dealt {}'.format(players[i].name, "["+new_cards[-1]))
+                    self.log.event(RENDER_AUCTION, players[i].name, round_state.hands[i][-1])
             self.player_messages[0].append('P0')
             self.player_messages[0].append('N' + ','.join([str(x) for x in round_state.stacks]) + '_' + ','.join([str(x) for x in round_state.bids]) + '_' + CCARDS(round_state.hands[0]))
             self.player_messages[1].append('P1')
             self.player_messages[1].append('N' + ','.join([str(x) for x in round_state.stacks]) + '_' + ','.join([str(x) for x in round_state.bids]) + '_' + CCARDS(round_state.hands[1]))
 
         if round_state.street == 0 and round_state.button == 0:
-            self.log.append('{} posts the blind of {}'.format(players[0].name, SMALL_BLIND))
-            self.log.append('{} posts the blind of {}'.format(players[1].name, BIG_BLIND))
-            self.log.append('{} dealt {}'.format(players[0].name, PCARDS(round_state.hands[0])))
-            self.log.append('{} dealt {}'.format(players[1].name, PCARDS(round_state.hands[1])))
+            self.log.event(RENDER_BLIND, players[0].name, SMALL_BLIND)
+            self.log.event(RENDER_BLIND, players[1].name, BIG_BLIND)
+            # the auction adds to the hands later, so the log keeps copies
+            self.log.event(RENDER_DEALT, players[0].name, tuple(round_state.hands[0]))
+            self.log.event(RENDER_DEALT, players[1].name, tuple(round_state.hands[1]))
             self.player_messages[0] = ['T0.', 'P0', 'H' + CCARDS(round_state.hands[0])]
             self.player_messages[1] = ['T0.', 'P1', 'H' + CCARDS(round_state.hands[1])]
         elif round_state.street > 0 and round_state.button == 1:
             board = round_state.deck.peek(round_state.street)
-            self.log.append(STREET_NAMES[round_state.street - 3] + ' ' + PCARDS(board) +
-                            PVALUE(players[0].name, STARTING_STACK-round_state.stacks[0]) +
-                            PVALUE(players[1].name, STARTING_STACK-round_state.stacks[1]))
+            self.log.event(RENDER_STREET, round_state.street, board,
+                           players[0].name, STARTING_STACK-round_state.stacks[0],
+                           players[1].name, STARTING_STACK-round_state.stacks[1])
             compressed_board = 'B' + CCARDS(board)
             self.player_messages[0].append(compressed_board)
             self.player_messages[1].append(compressed_board)
@@ -428,21 +1126,16 @@ class Game():
         Incorporates action information into the game log and player messages.
         '''
         if isinstance(action, FoldAction):
-            phrasing = ' folds'
             code = 'F'
         elif isinstance(action, CallAction):
-            phrasing = ' calls'
             code = 'C'
         elif isinstance(action, CheckAction):
-            phrasing = ' checks'
             code = 'K'
         elif isinstance(action, BidAction):
-            phrasing = ' bids ' + str(action.amount)
             code = 'A' + str(action.amount)
         else:  # isinstance(action, RaiseAction)
-            phrasing = (' bets ' if bet_override else ' raises to ') + str(action.amount)
             code = 'R' + str(action.amount)
-        self.log.append(name + phrasing)
+        self.log.event(render_action, name, action, bet_override)
         self.player_messages[0].append(code)
         self.player_messages[1].append(code)
 
@@ -452,45 +1145,189 @@ class Game():
         '''
         previous_state = round_state.previous_state
         if FoldAction not in previous_state.legal_actions():
-            self.log.append('{} shows {}'.format(players[0].name, PCARDS(previous_state.hands[0])))
-            self.log.append('{} shows {}'.format(players[1].name, PCARDS(previous_state.hands[1])))
+            self.log.event(RENDER_SHOWS, players[0].name, previous_state.hands[0])
+            self.log.event(RENDER_SHOWS, players[1].name, previous_state.hands[1])
             self.player_messages[0].append('O' + CCARDS(previous_state.hands[1]))
             self.player_messages[1].append('O' + CCARDS(previous_state.hands[0]))
-        self.log.append('{} awarded {}'.format(players[0].name, round_state.deltas[0]))
-        self.log.append('{} awarded {}'.format(players[1].name, round_state.deltas[1]))
-        if None in round_state.bids:
-            self.log.append('Players did not reach flop. No auction occured.')
-        else:
-            self.log.append('Players submitted bids of {} and {}'.format(round_state.bids[0], round_state.bids[1]))
+        self.log.event(RENDER_AWARDED, players[0].name, round_state.deltas[0])
+        self.log.event(RENDER_AWARDED, players[1].name, round_state.deltas[1])
+        self.log.event(RENDER_BIDS, round_state.bids)
 
         self.player_messages[0].append('D' + str(round_state.deltas[0]))
         self.player_messages[1].append('D' + str(round_state.deltas[1]))
 
-    def run_round(self, players):
+    def shuffle(self, replay):
         '''
-        Runs one round of poker (1 hand).
+        Returns the hands and deck of the next deal, or of the previous deal when replaying.
         '''
-        deck = eval7.Deck()
-        deck.shuffle()
-        hands = [deck.deal(2), deck.deal(2)]
+        if not replay:
+            if self.deals is not None:
+                self.dealt_cards = self.deals.next_deal()
+            else:
+                cards = list(CARDS)
+                self.rng.shuffle(cards)
+                self.dealt_cards = cards[:9] + cards[50:]
+            if self.deal_writer is not None:
+                self.deal_writer.write(self.dealt_cards)
+        return deck_from_deal(self.dealt_cards)
+
+    def deal_round(self, replay):
+        '''
+        Deals and returns the opening RoundState of a new round.
+        '''
+        hands, deck = self.shuffle(replay)
         auction = False
         bids = [None, None]
         pips = [SMALL_BLIND, BIG_BLIND]
         stacks = [STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND]
-        round_state = RoundState(0, 0, auction, bids, pips, stacks, hands, deck, None)
+        return RoundState(0, 0, auction, bids, pips, stacks, hands, deck)
+
+    def record_action(self, actions, active, player, round_state, action):
+        '''
+        Logs an action and remembers it for the hand history.
+        '''
+        bet_override = (round_state.pips == [0, 0])
+        self.log_action(player.name, action, bet_override)
+        if self.hand_history is not None:
+            amount = action.amount if isinstance(action, (RaiseAction, BidAction)) else 0
+            actions.append((active, round_state.street, ENCODE[type(action)], amount, player.response_time))
+
+    def record_round(self, players, round_state, actions):
+        '''
+        Logs the end of a round and writes it to the hand history.
+        '''
+        self.log_terminal_state(players, round_state)
+        if self.hand_history is not None:
+            previous_state = round_state.previous_state
+            showdown = FoldAction not in previous_state.legal_actions()
+            player_1_seat = 0 if players[0].name == self.player_specs[0][0] else 1
+            self.hand_history.write_round(self.round_num, player_1_seat, previous_state.street, showdown,
+                                          previous_state.hands, previous_state.deck.peek(5), round_state.bids,
+                                          round_state.deltas, actions)
+
+    def run_round(self, players, replay=False):
+        '''
+        Runs one round of poker (1 hand).
+        '''
+        round_state = self.deal_round(replay)
+        actions = []
         while not isinstance(round_state, TerminalState):
             self.log_round_state(players, round_state)
             active = round_state.button % 2
             player = players[active]
             action = player.query(round_state, self.player_messages[active], self.log)
-            bet_override = (round_state.pips == [0, 0])
-            self.log_action(player.name, action, bet_override)
+            self.record_action(actions, active, player, round_state, action)
             round_state = round_state.proceed(action)
-        self.log_terminal_state(players, round_state)
+        self.record_round(players, round_state, actions)
         for player, player_message, delta in zip(players, self.player_messages, round_state.deltas):
             player.query(round_state, player_message, self.log)
             player.bankroll += delta
 
+    def open_logs(self, offsets=None):
+        '''
+        Opens the game log, the hand history and the deal file, each if enabled.
+        A resumed game continues each file from its offset in the checkpoint.
+        '''
+        offsets = offsets or {}
+        log_name = None
+        if WRITE_GAME_LOG:
+            log_name = os.path.join(self.log_dir, GAME_LOG_FILENAME + ('.txt.gz' if COMPRESS_GAME_LOG else '.txt'))
+            print('Writing', log_name)
+        self.log = GameLog(log_name, GAME_LOG_BUFFER_SIZE, COMPRESS_GAME_LOG, offsets.get('game_log'))
+        if offsets.get('game_log') is None:
+            self.log.append('6.9630 MIT Pokerbots - ' + self.player_specs[0][0] + ' vs ' + self.player_specs[1][0])
+        if WRITE_HAND_HISTORY:
+            self.hand_history = HandHistoryWriter(os.path.join(self.log_dir, GAME_LOG_FILENAME + '.hh'),
+                                                  offsets.get('hand_history'))
+        if SAVE_DEALS:
+            self.deal_writer = DealWriter(os.path.join(self.log_dir, GAME_LOG_FILENAME + '.deals'), offsets.get('deals'))
+
+    def start_round(self, players, round_num):
+        '''
+        Logs the header of a new round.
+        '''
+        self.round_num = round_num
+        for player in players:
+            player.round_num = round_num
+        self.log.append('')
+        self.log.event(RENDER_ROUND, round_num, STANDINGS(players))
+
+    def end_game(self, players):
+        '''
+        Logs the final bankrolls.
+        '''
+        self.log.append('')
+        self.log.event(RENDER_FINAL, STANDINGS(players))
+
+    def checkpoint_name(self):
+        return os.path.join(self.log_dir, GAME_LOG_FILENAME + '_checkpoint.json')
+
+    def checkpoint(self, players):
+        '''
+        Writes the logs up to the current round and saves what is needed to continue the game
+        after it: bankrolls, game clocks, the state of the deals and the size of every log file.
+        '''
+        for player in players:
+            player.player_log.flush()
+        state = {
+            'version': CHECKPOINT_VERSION,
+            'players': self.player_specs,
+            'seed': self.seed,
+            'duplicate': self.duplicate,
+            'round_num': self.round_num,
+            'bankrolls': {player.name: player.bankroll for player in players},
+            'game_clocks': {player.name: player.game_clock for player in players},
+            'rng': self.rng.getstate(),
+            'deal_source': None if self.deals is None else type(self.deals).__name__,
+            'deals': None if self.deals is None else self.deals.getstate(),
+            'dealt_cards': None if self.dealt_cards is None else [card_id(card) for card in self.dealt_cards],
+            'offsets': {
+                'game_log': self.log.checkpoint(),
+                'hand_history': None if self.hand_history is None else self.hand_history.checkpoint(),
+                'deals': None if self.deal_writer is None else self.deal_writer.checkpoint(),
+            },
+        }
+        name = self.checkpoint_name()
+        # replace the previous checkpoint atomically, so a crash never leaves half of one
+        with open(name + '.tmp', 'w') as checkpoint_file:
+            json.dump(state, checkpoint_file)
+        os.replace(name + '.tmp', name)
+
+    def load_checkpoint(self):
+        '''
+        Reads the checkpoint in the log directory and restores the deals from it.
+        Returns None if there is no checkpoint, and the game starts from the first round.
+        '''
+        name = self.checkpoint_name()
+        if not os.path.exists(name):
+            print('No checkpoint in', self.log_dir + ', starting a new game')
+            return None
+        with open(name, 'r') as checkpoint_file:
+            state = json.load(checkpoint_file)
+        deal_source = None if self.deals is None else type(self.deals).__name__
+        if (state['version'] != CHECKPOINT_VERSION or state['players'] != [list(spec) for spec in self.player_specs] or
+                state['duplicate'] != self.duplicate or state['deal_source'] != deal_source):
+            raise ValueError(name + ' is a checkpoint of a different game')
+        self.seed = state['seed']
+        version, internal_state, gauss_next = state['rng']
+        self.rng.setstate((version, tuple(internal_state), gauss_next))
+        if self.deals is not None:
+            self.deals.setstate(state['deals'])
+        if state['dealt_cards'] is not None:
+            self.dealt_cards = [CARDS[card] for card in state['dealt_cards']]
+        self.round_num = state['round_num']
+        return state
+
+    def close_logs(self):
+        '''
+        Closes the game log, the hand history and the deal file. Whatever was played survives a crash.
+        '''
+        self.log.close()
+        if self.hand_history is not None:
+            self.hand_history.close()
+        if self.deal_writer is not None:
+            self.deal_writer.close()
+
     def run(self):
         '''
         Runs one game of poker.
@@ -501,26 +1338,52 @@ class Game():
         print('/_/  /_/___/ /_/   /_/   \\___/_/\\_\\\\__/_/ /_.__/\\___/\\__/___/')
         print()
         print('Starting the Pokerbots engine...')
-        players = [
-            Player(PLAYER_1_NAME, PLAYER_1_PATH),
-            Player(PLAYER_2_NAME, PLAYER_2_PATH)
-        ]
-        for player in players:
-            player.build()
-            player.run()
-        for round_num in range(1, NUM_ROUNDS + 1):
-            self.log.append('')
-            self.log.append('Round #' + str(round_num) + STATUS(players))
-            self.run_round(players)
-            players = players[::-1]
-        self.log.append('')
-        self.log.append('Final' + STATUS(players))
-        for player in players:
-            player.stop()
-        name = GAME_LOG_FILENAME + '.txt'
-        print('Writing', name)
-        with open(name, 'w') as log_file:
-            log_file.write('\n'.join(self.log))
+        state = self.load_checkpoint() if self.resume else None
+        if state is not None:
+            print('Resuming after round', state['round_num'])
+        print('Dealing with seed', self.seed, '(duplicate)' if self.duplicate else '')
+        self.open_logs(state['offsets'] if state is not None else None)
+        player_class = InProcessPlayer if self.headless else Player
+        players = []
+        finished = False
+        try:
+            for name, path in self.player_specs:
+                if self.pool is not None:
+                    players.append(self.pool.acquire(name, path, self.log_dir))
+                else:
+                    players.append(player_class(name, path, self.log_dir, state is not None))
+                    players[-1].build()
+                    players[-1].run()
+            if state is not None:
+                for player in players:
+                    player.bankroll = state['bankrolls'][player.name]
+                    player.game_clock = state['game_clocks'][player.name]
+                # the seats swap every round
+                players = players[::-1] if self.round_num % 2 else players
+            for round_num in range(self.round_num + 1, self.num_rounds + 1):
+                self.start_round(players, round_num)
+                # in duplicate mode every even round replays the previous deal with the seats swapped
+                self.run_round(players, self.duplicate and round_num % 2 == 0)
+                self.log.end_round()
+                players = players[::-1]
+                if CHECKPOINT_INTERVAL > 0 and round_num % CHECKPOINT_INTERVAL == 0 and round_num < self.num_rounds:
+                    self.checkpoint(players)
+            self.end_game(players)
+            finished = True
+            if WRITE_METRICS:
+                write_metrics(os.path.join(self.log_dir, GAME_LOG_FILENAME + '_metrics.json'), players)
+            # a finished game is not resumed
+            if os.path.exists(self.checkpoint_name()):
+                os.remove(self.checkpoint_name())
+        finally:
+            for player in players:
+                # a game that failed midway leaves its pokerbots mid-round, so they are not reused
+                if finished and self.pool is not None:
+                    self.pool.release(player)
+                else:
+                    player.stop()
+            self.close_logs()
+        return {player.name: player.bankroll for player in players}
 
 
 if __name__ == '__main__':
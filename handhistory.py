@@ -0,0 +1,168 @@
+'''
+Compact binary hand histories written by the engine alongside the text game log.
+
+The file starts with a 12 byte header followed by one fixed-size record per round, so the
+number of rounds is the size of the rest of the file over the record size.
+Cards are integer ids (rank * 4 + suit, the order of eval7.Deck) and -1 marks an
+empty slot. Actions are the ASCII codes of their letters and amounts are 32 bit.
+Everything is stored by seat, where seat 0 posts the small blind.
+'''
+import struct
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAGIC = b'PBHH'
+VERSION = 2
+# hands with more actions keep the first MAX_ACTIONS, num_actions still counts all of them
+MAX_ACTIONS = 24
+NO_CARD = -1
+NO_BID = -1
+RANKS = '23456789TJQKA'
+SUITS = 'cdhs'
+CARD_NAMES = [rank + suit for rank in RANKS for suit in SUITS]
+
+HEADER = struct.Struct('<4sHHI')
+# round_num, player_1_seat, street, showdown, num_actions, hands (2 x 3), board (5), bids (2), deltas (2)
+ROUND = struct.Struct('<IBBBB6b5b2i2i')
+# seat, street, code, amount, response time in seconds
+ACTION = struct.Struct('<BBBif')
+RECORD_SIZE = ROUND.size + MAX_ACTIONS * ACTION.size
+
+if np is not None:
+    ACTION_DTYPE = np.dtype([('seat', 'u1'), ('street', 'u1'), ('code', 'u1'), ('amount', '<i4'), ('time', '<f4')])
+    RECORD_DTYPE = np.dtype([
+        ('round_num', '<u4'),
+        ('player_1_seat', 'u1'),
+        ('street', 'u1'),
+        ('showdown', 'u1'),
+        ('num_actions', 'u1'),
+        ('hands', 'i1', (2, 3)),
+        ('board', 'i1', (5,)),
+        ('bids', '<i4', (2,)),
+        ('deltas', '<i4', (2,)),
+        ('actions', ACTION_DTYPE, (MAX_ACTIONS,)),
+    ])
+    assert RECORD_DTYPE.itemsize == RECORD_SIZE
+
+
+def card_id(card):
+    '''
+    Converts an eval7.Card to its integer id.
+    '''
+    return card.rank * 4 + card.suit
+
+
+class HandHistoryWriter():
+    '''
+    Appends one fixed-size binary record per round to a hand history file.
+    '''
+
+    def __init__(self, name, offset=None):
+        if offset is None:
+            self.history_file = open(name, 'wb')
+            self.history_file.write(HEADER.pack(MAGIC, VERSION, MAX_ACTIONS, RECORD_SIZE))
+        else:
+            # a resumed game drops the records written after its checkpoint
+            self.history_file = open(name, 'r+b')
+            self.history_file.truncate(offset)
+            self.history_file.seek(offset)
+        self.record = bytearray(RECORD_SIZE)
+
+    def write_round(self, round_num, player_1_seat, street, showdown, hands, board, bids, deltas, actions):
+        '''
+        Writes one round. hands and bids are by seat, board holds eval7 cards and actions
+        holds (seat, street, code, amount, response_time) tuples in the order they were played.
+        '''
+        record = self.record
+        hand_ids = [NO_CARD] * 6
+        for seat in range(2):
+            for i, card in enumerate(hands[seat][:3]):
+                hand_ids[3 * seat + i] = card_id(card)
+        ROUND.pack_into(record, 0, round_num, player_1_seat, street, showdown, min(len(actions), 255),
+                        *hand_ids, *[card_id(card) for card in board],
+                        *[NO_BID if bid is None else bid for bid in bids], *deltas)
+        offset = ROUND.size
+        for seat, action_street, code, amount, response_time in actions[:MAX_ACTIONS]:
+            ACTION.pack_into(record, offset, seat, action_street, ord(code), amount, response_time)
+            offset += ACTION.size
+        record[offset:] = bytes(RECORD_SIZE - offset)
+        self.history_file.write(record)
+
+    def checkpoint(self):
+        '''
+        Writes the buffered records and returns the size of the file.
+        '''
+        self.history_file.flush()
+        return self.history_file.tell()
+
+    def close(self):
+        self.history_file.close()
+
+
+class HandHistory():
+    '''
+    Memory-maps a hand history file and exposes its records as NumPy views.
+    '''
+
+    def __init__(self, name):
+        if np is None:
+            raise ImportError('reading hand histories requires numpy')
+        with open(name, 'rb') as history_file:
+            magic, version, max_actions, record_size = HEADER.unpack(history_file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION or max_actions != MAX_ACTIONS or record_size != RECORD_SIZE:
+            raise ValueError(name + ' is not a version ' + str(VERSION) + ' hand history')
+        self.records = np.memmap(name, dtype=RECORD_DTYPE, mode='r', offset=HEADER.size)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def hands(self):
+        return self.records['hands']
+
+    @property
+    def board(self):
+        return self.records['board']
+
+    @property
+    def bids(self):
+        return self.records['bids']
+
+    @property
+    def deltas(self):
+        return self.records['deltas']
+
+    @property
+    def actions(self):
+        return self.records['actions']
+
+    @property
+    def num_actions(self):
+        return self.records['num_actions']
+
+    def player_1_deltas(self):
+        '''
+        Returns the first player's bankroll change in every round.
+        '''
+        seats = self.records['player_1_seat'].astype(np.intp)
+        return self.deltas[np.arange(len(self)), seats]
+
+
+def card_names(ids):
+    '''
+    Converts integer card ids back to strings, skipping empty slots.
+    '''
+    return [CARD_NAMES[i] for i in ids if i != NO_CARD]
+
+
+if __name__ == '__main__':
+    history = HandHistory(sys.argv[1])
+    deltas = history.player_1_deltas()
+    print(len(history), 'rounds')
+    print('Player 1 total', int(deltas.sum()), 'mean {:.3f}'.format(deltas.mean() if len(history) else 0.))
+    print('Showdowns', int(history.records['showdown'].sum()))
+    print('Mean response time {:.6f}s'.format(float(history.actions['time'][history.actions['code'] != 0].mean())))
@@ -0,0 +1,210 @@
+'''
+Runs a round-robin league between every pokerbot directory, in both seat orders,
+and rates the pokerbots with a Bradley-Terry model on the Elo scale.
+
+Results are appended to a cache as matches finish, so rerunning the league only
+plays the matches of new or edited pokerbots, or of an interrupted run.
+'''
+from multiprocessing import Pool
+import argparse
+import random
+import json
+import math
+import os
+
+from buildcache import file_digests, fingerprint
+from tournament import run_match, start_worker
+from config import *
+
+# fields that identify a match in the results cache
+KEY_FIELDS = ['player_1', 'fingerprint_1', 'player_2', 'fingerprint_2', 'seed', 'rounds', 'duplicate']
+
+
+def discover(root, exclude):
+    '''
+    Returns the paths of the pokerbot directories under root, those with a commands.json.
+    '''
+    bots = []
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if name not in exclude and os.path.isfile(os.path.join(path, 'commands.json')):
+            bots.append(path)
+    return bots
+
+
+def fingerprint_bot(path):
+    '''
+    Hashes the files of a pokerbot directory, so an edited pokerbot plays its matches again.
+    '''
+    return fingerprint(file_digests(path))[:16]
+
+
+def load_results(name):
+    '''
+    Reads the results cache into a dictionary from match keys to player 1's bankroll.
+    '''
+    results = {}
+    if os.path.exists(name):
+        with open(name, 'r') as cache_file:
+            for line in cache_file:
+                if line.strip():
+                    record = json.loads(line)
+                    results[tuple(record[field] for field in KEY_FIELDS)] = record['bankroll']
+    return results
+
+
+def bradley_terry(num_bots, games, prior=1., iterations=10000, tolerance=1e-10):
+    '''
+    Fits Bradley-Terry strengths to (i, j, score) games, where score is bot i's result
+    against bot j (1 for a win, 0.5 for a tie), and returns them as Elo ratings with mean 0.
+    Every pair that met also shares prior virtual tied games, which keeps the ratings
+    of unbeaten or winless bots finite.
+    '''
+    wins = [[0.] * num_bots for _ in range(num_bots)]
+    counts = [[0.] * num_bots for _ in range(num_bots)]
+    for i, j, score in games:
+        wins[i][j] += score
+        wins[j][i] += 1. - score
+        counts[i][j] += 1.
+        counts[j][i] += 1.
+    for i in range(num_bots):
+        for j in range(num_bots):
+            if counts[i][j]:
+                wins[i][j] += prior / 2
+                counts[i][j] += prior
+    strengths = [1.] * num_bots
+    for _ in range(iterations):
+        # minorization-maximization update (Hunter, 2004)
+        updated = []
+        for i in range(num_bots):
+            denominator = sum(counts[i][j] / (strengths[i] + strengths[j]) for j in range(num_bots) if counts[i][j])
+            updated.append(sum(wins[i]) / denominator if denominator else strengths[i])
+        scale = math.exp(sum(math.log(strength) for strength in updated) / num_bots)
+        updated = [strength / scale for strength in updated]
+        change = max(abs(new - old) / old for new, old in zip(updated, strengths))
+        strengths = updated
+        if change < tolerance:
+            break
+    return [400 * math.log10(strength) for strength in strengths]
+
+
+def bootstrap(num_bots, games, confidence, samples, seed):
+    '''
+    Returns a percentile bootstrap interval of every bot's rating, resampling games.
+    '''
+    rng = random.Random(seed)
+    ratings = [bradley_terry(num_bots, rng.choices(games, k=len(games))) for _ in range(samples)]
+    intervals = []
+    for i in range(num_bots):
+        ordered = sorted(rating[i] for rating in ratings)
+        low = ordered[int((1 - confidence) / 2 * (samples - 1))]
+        high = ordered[int((1 + confidence) / 2 * (samples - 1))]
+        intervals.append([low, high])
+    return intervals
+
+
+def cross_table(bots, scheduled, results):
+    '''
+    Returns every bot's number of matches, mean bankroll and score against every other bot,
+    over both seat orders.
+    '''
+    table = {row: {column: {'matches': 0, 'total': 0, 'score': 0.} for column in bots if column != row} for row in bots}
+    for key in scheduled:
+        player_1, player_2, bankroll = key[0], key[2], results[key]
+        for row, column, delta in ((player_1, player_2, bankroll), (player_2, player_1, -bankroll)):
+            cell = table[row][column]
+            cell['matches'] += 1
+            cell['total'] += delta
+            cell['score'] += 1. if delta > 0 else 0.5 if delta == 0 else 0.
+    for row in table.values():
+        for cell in row.values():
+            cell['mean'] = cell['total'] / cell['matches'] if cell['matches'] else 0.
+    return table
+
+
+def parse_args():
+    '''
+    Parses the league configuration. Defaults come from config.py.
+    '''
+    parser = argparse.ArgumentParser(prog='python3 league.py')
+    parser.add_argument('--root', type=str, default='.', help='Directory to search for pokerbots')
+    parser.add_argument('--exclude', type=str, nargs='*', default=[], help='Pokerbot directories to leave out')
+    parser.add_argument('--matches', type=int, default=2, help='Matches per pairing and seat order')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of worker processes')
+    parser.add_argument('--rounds', type=int, default=NUM_ROUNDS, help='Rounds per match')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the first match of every pairing; match i uses seed + i')
+    parser.add_argument('--confidence', type=float, default=0.95, help='Confidence level of the rating intervals')
+    parser.add_argument('--bootstrap', type=int, default=200, help='Bootstrap samples for the rating intervals')
+    parser.add_argument('--headless', action='store_true', default=HEADLESS, help='Run bots inside the engine processes')
+    parser.add_argument('--duplicate', action='store_true', default=DUPLICATE, help='Replay every deal with the seats swapped')
+    parser.add_argument('--persistent', action='store_true', help='Keep pokerbots running between the matches of a worker')
+    parser.add_argument('--out', type=str, default='league', help='Directory for match logs, the results cache and the ratings')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    bots = discover(args.root, args.exclude)
+    names = {bot: os.path.basename(bot) for bot in bots}
+    fingerprints = {bot: fingerprint_bot(bot) for bot in bots}
+    os.makedirs(args.out, exist_ok=True)
+    cache_name = os.path.join(args.out, 'results.jsonl')
+    results = load_results(cache_name)
+    # both seat orders of a pairing use the same seeds, and so the same deals
+    scheduled = [(player_1, fingerprints[player_1], player_2, fingerprints[player_2], args.seed + i, args.rounds, args.duplicate)
+                 for player_1 in bots for player_2 in bots if player_1 != player_2 for i in range(args.matches)]
+    pending = [key for key in scheduled if key not in results]
+    print('{} pokerbots, {} matches, {} cached'.format(len(bots), len(scheduled), len(scheduled) - len(pending)))
+    matches = [(index, key[4], (PLAYER_1_NAME, key[0]), (PLAYER_2_NAME, key[2]), args.rounds,
+                os.path.join(args.out, '{}_vs_{}'.format(names[key[0]], names[key[2]]).replace(' ', '_'),
+                             'match_{:04d}'.format(key[4])), args.headless, args.duplicate)
+               for index, key in enumerate(pending)]
+    if matches:
+        initializer = start_worker if args.persistent else None
+        with open(cache_name, 'a') as cache_file, Pool(args.workers, initializer, (args.headless,)) as pool:
+            for index, seed, bankroll in pool.imap_unordered(run_match, matches):
+                key = pending[index]
+                results[key] = bankroll
+                record = dict(zip(KEY_FIELDS, key), bankroll=bankroll)
+                cache_file.write(json.dumps(record) + '\n')
+                cache_file.flush()
+                print('{} vs {} (seed {}): {}'.format(names[key[0]], names[key[2]], seed, bankroll))
+    index_of = {bot: i for i, bot in enumerate(bots)}
+    games = []
+    for key in scheduled:
+        bankroll = results[key]
+        games.append((index_of[key[0]], index_of[key[2]], 1. if bankroll > 0 else 0.5 if bankroll == 0 else 0.))
+    ratings = bradley_terry(len(bots), games)
+    intervals = bootstrap(len(bots), games, args.confidence, args.bootstrap, args.seed)
+    table = cross_table(bots, scheduled, results)
+    standings = sorted(range(len(bots)), key=lambda i: -ratings[i])
+    width = max([len(name) for name in names.values()] + [8])
+    print()
+    print('Bradley-Terry ratings on the Elo scale with {:.0%} bootstrap intervals'.format(args.confidence))
+    for rank, i in enumerate(standings, 1):
+        print('{:>2}. {:<{width}} {:+7.1f}  [{:+7.1f}, {:+7.1f}]'.format(rank, names[bots[i]], ratings[i], *intervals[i], width=width))
+    print()
+    print('Mean bankroll per match of the row against the column')
+    order = [bots[i] for i in standings]
+    print(' ' * width + ''.join(' {:>{width}}'.format(names[column], width=width) for column in order))
+    for row in order:
+        cells = ['-' if row == column else '{:+.1f}'.format(table[row][column]['mean']) for column in order]
+        print('{:<{width}}'.format(names[row], width=width) + ''.join(' {:>{width}}'.format(cell, width=width) for cell in cells))
+    league = {
+        'rounds_per_match': args.rounds,
+        'matches_per_pairing': args.matches,
+        'duplicate': args.duplicate,
+        'confidence': args.confidence,
+        'ratings': {names[bots[i]]: {'path': bots[i], 'fingerprint': fingerprints[bots[i]],
+                                     'rating': ratings[i], 'interval': intervals[i]} for i in standings},
+        'cross_table': {names[row]: {names[column]: cell for column, cell in cells.items()} for row, cells in table.items()},
+    }
+    name = os.path.join(args.out, 'league.json')
+    print()
+    print('Writing', name)
+    with open(name, 'w') as league_file:
+        json.dump(league, league_file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
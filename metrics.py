@@ -0,0 +1,114 @@
+'''
+Summarizes the per-query latency samples the engine records for each pokerbot.
+'''
+from collections import namedtuple
+import json
+
+# one sample per query; decision is the legal action codes, e.g. 'CFR', or 'ack' at the end of a round
+# cpu is the CPU time the pokerbot used to answer the query, None where it cannot be measured
+LatencySample = namedtuple('LatencySample', ['round_num', 'street', 'decision', 'ack', 'latency', 'cpu'])
+
+STREET_LABELS = {0: 'Preflop', 3: 'Flop', 4: 'Turn', 5: 'River'}
+# histogram buckets are half decades from 1 microsecond to 10 seconds
+BUCKET_EDGES = [10 ** (k / 2) for k in range(-12, 3)]
+PERCENTILES = [50, 90, 99, 99.9]
+
+
+def street_label(round_state):
+    '''
+    Names the street of a RoundState, counting the auction as its own street.
+    '''
+    if round_state.auction:
+        return 'Auction'
+    return STREET_LABELS[round_state.street]
+
+
+def percentile(ordered, p):
+    '''
+    Returns the p-th percentile of a sorted list by nearest rank.
+    '''
+    index = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def histogram(ordered):
+    '''
+    Counts sorted latencies per bucket. The first bucket holds everything below the first edge.
+    '''
+    counts = [0] * (len(BUCKET_EDGES) + 1)
+    bucket = 0
+    for latency in ordered:
+        while bucket < len(BUCKET_EDGES) and latency >= BUCKET_EDGES[bucket]:
+            bucket += 1
+        counts[bucket] += 1
+    return {'edges': BUCKET_EDGES, 'counts': counts}
+
+
+def summarize(latencies):
+    '''
+    Computes the count, total, mean, percentiles and histogram of a list of latencies in seconds.
+    '''
+    ordered = sorted(latencies)
+    if not ordered:
+        return {'count': 0, 'total': 0.}
+    return {
+        'count': len(ordered),
+        'total': sum(ordered),
+        'mean': sum(ordered) / len(ordered),
+        'max': ordered[-1],
+        'percentiles': {str(p): percentile(ordered, p) for p in PERCENTILES},
+        'histogram': histogram(ordered),
+    }
+
+
+def group_by(samples, key):
+    groups = {}
+    for sample in samples:
+        groups.setdefault(key(sample), []).append(sample.latency)
+    return {name: summarize(latencies) for name, latencies in sorted(groups.items())}
+
+
+def cpu_metrics(samples):
+    '''
+    Summarizes the CPU time samples, which have the resolution of a kernel clock tick.
+    '''
+    measured = [sample for sample in samples if sample.cpu is not None]
+    if not measured:
+        return None
+    return {
+        'wall_time': sum(sample.latency for sample in measured),
+        'all': summarize([sample.cpu for sample in measured]),
+        'decisions': summarize([sample.cpu for sample in measured if not sample.ack]),
+    }
+
+
+def player_metrics(player):
+    '''
+    Summarizes one player's latency samples overall and by street, decision and ack,
+    and its CPU time where it was measured.
+    '''
+    samples = player.latencies
+    decisions = [sample for sample in samples if not sample.ack]
+    rounds = {}
+    for sample in samples:
+        rounds[sample.round_num] = rounds.get(sample.round_num, 0.) + sample.latency
+    return {
+        'game_clock_remaining': player.game_clock,
+        'log_bytes_dropped': player.player_log.dropped,
+        'cpu_time': cpu_metrics(samples),
+        'all': summarize([sample.latency for sample in samples]),
+        'decisions': summarize([sample.latency for sample in decisions]),
+        'acks': summarize([sample.latency for sample in samples if sample.ack]),
+        'by_street': group_by(decisions, lambda sample: sample.street),
+        'by_decision': group_by(decisions, lambda sample: sample.decision),
+        'by_street_and_decision': group_by(decisions, lambda sample: sample.street + ' ' + sample.decision),
+        'slowest_rounds': sorted(rounds.items(), key=lambda item: -item[1])[:10],
+    }
+
+
+def write_metrics(name, players):
+    '''
+    Writes every player's latency summary to a JSON file.
+    '''
+    with open(name, 'w') as metrics_file:
+        json.dump({player.name: player_metrics(player) for player in players}, metrics_file, indent=4)
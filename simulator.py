@@ -0,0 +1,378 @@
+'''
+Vectorized batch simulator for the auction variant, for strategy research with
+simple parametric policies. Requires numpy.
+
+A batch of hands is advanced together under exactly the rules of engine.RoundState:
+blinds, the second price auction after the flop (ties deal both auction cards),
+raise and bid bounds, the engine's fallback for illegal actions and a showdown
+using batched hand ranks. Cards are integer ids (rank * 4 + suit, the order of
+eval7.Deck) and -1 marks an empty slot.
+'''
+from collections import namedtuple
+import argparse
+import time
+import sys
+import os
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+from config import STARTING_STACK, BIG_BLIND, SMALL_BLIND
+
+FOLD, CALL, CHECK, RAISE, BID = range(5)
+NO_CARD = -1
+NO_BID = -1
+
+# a policy sees the hands it has to act in from its own point of view and
+# returns an array of action codes and an array of amounts (ignored unless RAISE or BID)
+PolicyView = namedtuple('PolicyView', ['seat', 'street', 'auction', 'hole', 'board', 'my_pip', 'opp_pip',
+                                       'my_stack', 'opp_stack', 'my_bid', 'opp_bid', 'can_fold', 'can_call',
+                                       'can_check', 'can_raise', 'min_raise', 'max_raise', 'min_bid', 'max_bid'])
+SimulationResult = namedtuple('SimulationResult', ['deltas', 'seats', 'streets', 'showdowns', 'bids'])
+
+# HIGHEST_BIT[mask] is the index of the highest set bit of a 14 bit mask, POPCOUNT[mask] its number of set bits
+HIGHEST_BIT = np.zeros(1 << 14, dtype=np.int64)
+for _bit in range(14):
+    HIGHEST_BIT[1 << _bit:1 << (_bit + 1)] = _bit
+POPCOUNT = np.array([bin(mask).count('1') for mask in range(1 << 14)], dtype=np.int64)
+HIGH_CARD, PAIR, TWO_PAIR, TRIPS, STRAIGHT, FLUSH, FULL_HOUSE, QUADS, STRAIGHT_FLUSH = range(9)
+
+
+def _pop_highest(masks, count):
+    '''
+    Removes the count highest ranks from each mask and returns them as columns.
+    '''
+    masks = masks.copy()
+    ranks = np.zeros((len(masks), count), dtype=np.int64)
+    for i in range(count):
+        high = HIGHEST_BIT[masks]
+        ranks[:, i] = np.where(masks > 0, high, 0)
+        masks &= ~(1 << high)
+    return ranks
+
+
+def _straight_high(masks):
+    '''
+    Returns the top rank of the best straight in each 13 bit rank mask, or -1.
+    '''
+    # bit 0 is the ace playing low, bit r + 1 is rank r
+    extended = (masks << 1) | ((masks >> 12) & 1)
+    runs = extended & (extended >> 1) & (extended >> 2) & (extended >> 3) & (extended >> 4)
+    return np.where(runs > 0, HIGHEST_BIT[runs] + 3, -1)
+
+
+def _encode(category, kickers):
+    value = category.astype(np.int64) << 20
+    for i in range(kickers.shape[1]):
+        value |= kickers[:, i] << (16 - 4 * i)
+    return value
+
+
+def evaluate(cards):
+    '''
+    Ranks the best five card hand within each row of a (batch, n) array of card ids.
+    Returns an int64 array that orders hands exactly as eval7.evaluate does.
+    '''
+    cards = np.asarray(cards, dtype=np.int64)
+    valid = cards >= 0
+    ranks = np.where(valid, cards >> 2, 0)
+    suits = np.where(valid, cards & 3, 0)
+    rank_counts = ((ranks[:, :, None] == np.arange(13)) & valid[:, :, None]).sum(axis=1)
+    # cards are distinct, so summing rank bits builds each suit's rank mask
+    suit_masks = np.column_stack([np.where(valid & (suits == suit), 1 << ranks, 0).sum(axis=1) for suit in range(4)])
+    bits = 1 << np.arange(13, dtype=np.int64)
+    rank_mask = ((rank_counts > 0) * bits).sum(axis=1)
+    quad_mask = ((rank_counts == 4) * bits).sum(axis=1)
+    trip_mask = ((rank_counts == 3) * bits).sum(axis=1)
+    pair_mask = ((rank_counts == 2) * bits).sum(axis=1)
+    rows = np.arange(len(cards))
+    suit_sizes = POPCOUNT[suit_masks]
+    flush_suit = suit_sizes.argmax(axis=1)
+    has_flush = suit_sizes[rows, flush_suit] >= 5
+    flush_mask = np.where(has_flush, suit_masks[rows, flush_suit], 0)
+
+    value = _encode(np.full(len(cards), HIGH_CARD), _pop_highest(rank_mask, 5))
+    # each category below outranks the ones before it, so later matches overwrite earlier ones
+    top_pair = _pop_highest(pair_mask, 1)[:, 0]
+    is_pair = pair_mask > 0
+    pair_kickers = _pop_highest(rank_mask & ~(1 << top_pair), 3)
+    value = np.where(is_pair, _encode(np.full(len(cards), PAIR), np.column_stack([top_pair, pair_kickers])), value)
+
+    pairs = _pop_highest(pair_mask, 2)
+    is_two_pair = (pair_mask & (pair_mask - 1)) > 0
+    two_pair_kicker = _pop_highest(rank_mask & ~(1 << pairs[:, 0]) & ~(1 << pairs[:, 1]), 1)
+    value = np.where(is_two_pair, _encode(np.full(len(cards), TWO_PAIR), np.column_stack([pairs, two_pair_kicker])), value)
+
+    top_trips = _pop_highest(trip_mask, 1)[:, 0]
+    is_trips = trip_mask > 0
+    trips_kickers = _pop_highest(rank_mask & ~(1 << top_trips), 2)
+    value = np.where(is_trips, _encode(np.full(len(cards), TRIPS), np.column_stack([top_trips, trips_kickers])), value)
+
+    straight = _straight_high(rank_mask)
+    value = np.where(straight >= 0, _encode(np.full(len(cards), STRAIGHT), straight[:, None]), value)
+
+    value = np.where(has_flush, _encode(np.full(len(cards), FLUSH), _pop_highest(flush_mask, 5)), value)
+
+    # a full house pairs the best trips with the best other trips or pair
+    full_pair = _pop_highest((trip_mask | pair_mask) & ~(1 << top_trips), 1)[:, 0]
+    is_full_house = is_trips & (((trip_mask | pair_mask) & ~(1 << top_trips)) > 0)
+    value = np.where(is_full_house, _encode(np.full(len(cards), FULL_HOUSE), np.column_stack([top_trips, full_pair])), value)
+
+    quads = _pop_highest(quad_mask, 1)[:, 0]
+    quad_kicker = _pop_highest(rank_mask & ~(1 << quads), 1)
+    value = np.where(quad_mask > 0, _encode(np.full(len(cards), QUADS), np.column_stack([quads, quad_kicker])), value)
+
+    straight_flush = _straight_high(flush_mask)
+    value = np.where(straight_flush >= 0, _encode(np.full(len(cards), STRAIGHT_FLUSH), straight_flush[:, None]), value)
+    return value
+
+
+def deal(batch_size, rng):
+    '''
+    Shuffles one deck per hand. Returns the hole cards by seat (batch, 2, 2), the board
+    (batch, 5) and the two auction cards at the bottom of the deck (batch, 2), drawn in the
+    same positions as engine.Game.run_round.
+    '''
+    decks = np.argsort(rng.random((batch_size, 52)), axis=1)
+    hole = decks[:, :4].reshape(batch_size, 2, 2)
+    board = decks[:, 4:9]
+    # the engine deals the last card of the deck first, then the second to last
+    auction_cards = decks[:, [51, 50]]
+    return hole, board, auction_cards
+
+
+class BatchRoundState():
+    '''
+    Encodes a batch of rounds of poker as arrays indexed by hand.
+    '''
+
+    def __init__(self, hole, board, auction_cards):
+        batch_size = len(board)
+        self.button = np.zeros(batch_size, dtype=np.int64)
+        self.street = np.zeros(batch_size, dtype=np.int64)
+        self.auction = np.zeros(batch_size, dtype=bool)
+        self.bids = np.full((batch_size, 2), NO_BID, dtype=np.int64)
+        self.pips = np.tile(np.array([SMALL_BLIND, BIG_BLIND], dtype=np.int64), (batch_size, 1))
+        self.stacks = np.tile(np.array([STARTING_STACK - SMALL_BLIND, STARTING_STACK - BIG_BLIND], dtype=np.int64),
+                              (batch_size, 1))
+        self.hole = np.concatenate([hole, np.full((batch_size, 2, 1), NO_CARD, dtype=np.int64)], axis=2)
+        self.board = board
+        self.auction_cards = auction_cards
+        self.done = np.zeros(batch_size, dtype=bool)
+        self.showdown = np.zeros(batch_size, dtype=bool)
+        self.deltas = np.zeros(batch_size, dtype=np.int64)
+
+    def view(self, idx):
+        '''
+        Builds the PolicyView of the active players in hands idx, applying engine legal_actions.
+        '''
+        rows = np.arange(len(idx))
+        active = self.button[idx] % 2
+        pips = self.pips[idx]
+        stacks = self.stacks[idx]
+        bids = self.bids[idx]
+        my_pip, opp_pip = pips[rows, active], pips[rows, 1 - active]
+        my_stack, opp_stack = stacks[rows, active], stacks[rows, 1 - active]
+        street = self.street[idx]
+        auction = self.auction[idx]
+        continue_cost = opp_pip - my_pip
+        bets_forbidden = (stacks[:, 0] == 0) | (stacks[:, 1] == 0)
+        raises_forbidden = (continue_cost >= my_stack) | (opp_stack == 0)
+        betting = ~auction
+        can_check = betting & (continue_cost == 0)
+        can_fold = betting & (continue_cost > 0)
+        can_raise = np.where(continue_cost == 0, ~bets_forbidden, ~raises_forbidden) & betting
+        max_contribution = np.minimum(my_stack, opp_stack + continue_cost)
+        min_contribution = np.minimum(max_contribution, continue_cost + np.maximum(continue_cost, BIG_BLIND))
+        board = np.where(np.arange(5) < street[:, None], self.board[idx], NO_CARD)
+        return PolicyView(active, street, auction, self.hole[idx, active], board, my_pip, opp_pip, my_stack,
+                          opp_stack, bids[rows, active], bids[rows, 1 - active], can_fold, can_fold, can_check,
+                          can_raise, my_pip + min_contribution, my_pip + max_contribution,
+                          np.zeros(len(idx), dtype=np.int64), my_stack)
+
+    def enforce(self, view, codes, amounts):
+        '''
+        Replaces illegal actions the way engine.Player.query does: a bid of 0 during the
+        auction, otherwise a check if possible and a fold if not.
+        '''
+        codes = np.asarray(codes, dtype=np.int64)
+        amounts = np.asarray(amounts, dtype=np.int64)
+        legal = np.select([codes == FOLD, codes == CALL, codes == CHECK, codes == RAISE, codes == BID],
+                          [view.can_fold, view.can_call, view.can_check,
+                           view.can_raise & (view.min_raise <= amounts) & (amounts <= view.max_raise),
+                           view.auction & (view.min_bid <= amounts) & (amounts <= view.max_bid)], False)
+        fallback = np.where(view.auction, BID, np.where(view.can_check, CHECK, FOLD))
+        return np.where(legal, codes, fallback), np.where(legal, amounts, 0)
+
+    def proceed_street(self, idx):
+        '''
+        Resets the pips of hands idx and advances them to the next round of betting.
+        '''
+        river = self.street[idx] == 5
+        self.run_showdown(idx[river])
+        idx = idx[~river]
+        self.button[idx] = 1
+        self.pips[idx] = 0
+        flop = self.street[idx] == 0
+        self.auction[idx[flop]] = True
+        self.street[idx] = np.where(flop, 3, self.street[idx] + 1)
+
+    def run_showdown(self, idx):
+        '''
+        Compares the players' hands in hands idx and computes payoffs.
+        '''
+        if len(idx) == 0:
+            return
+        scores = [evaluate(np.concatenate([self.board[idx], self.hole[idx, seat]], axis=1)) for seat in range(2)]
+        stacks = self.stacks[idx]
+        self.deltas[idx] = np.select([scores[0] > scores[1], scores[0] < scores[1]],
+                                     [STARTING_STACK - stacks[:, 1], stacks[:, 0] - STARTING_STACK],
+                                     (stacks[:, 0] - stacks[:, 1]) // 2)
+        self.done[idx] = True
+        self.showdown[idx] = True
+
+    def proceed(self, idx, codes, amounts):
+        '''
+        Advances hands idx by one action of their active player, as engine.RoundState.proceed.
+        '''
+        button = self.button[idx]
+        street = self.street[idx]
+        active = button % 2
+        fold = codes == FOLD
+        folded = idx[fold]
+        stacks = self.stacks[folded]
+        self.deltas[folded] = np.where(active[fold] == 0, stacks[:, 0] - STARTING_STACK, STARTING_STACK - stacks[:, 1])
+        self.done[folded] = True
+
+        call = codes == CALL
+        limp = call & (button == 0)  # sb calls bb preflop
+        self.button[idx[limp]] = 1
+        self.pips[idx[limp]] = BIG_BLIND
+        self.stacks[idx[limp]] = STARTING_STACK - BIG_BLIND
+        called = call & ~limp
+        calls, callers = idx[called], active[called]
+        contribution = self.pips[calls, 1 - callers] - self.pips[calls, callers]
+        self.stacks[calls, callers] -= contribution
+        self.pips[calls, callers] += contribution
+        self.button[calls] += 1
+
+        check = codes == CHECK
+        street_over = check & (((street == 0) & (button > 0)) | (button > 1))
+        self.button[idx[check & ~street_over]] += 1
+
+        raised = codes == RAISE
+        raises, raisers = idx[raised], active[raised]
+        contribution = amounts[raised] - self.pips[raises, raisers]
+        self.stacks[raises, raisers] -= contribution
+        self.pips[raises, raisers] += contribution
+        self.button[raises] += 1
+
+        bid = codes == BID
+        bids, bidders = idx[bid], active[bid]
+        self.bids[bids, bidders] = amounts[bid]
+        complete = (self.bids[bids] != NO_BID).all(axis=1)
+        self.button[bids[~complete]] += 1
+        settled = bids[complete]
+        settled_bids = self.bids[settled]
+        tie = settled_bids[:, 0] == settled_bids[:, 1]
+        ties = settled[tie]
+        self.hole[ties, 0, 2] = self.auction_cards[ties, 0]
+        self.hole[ties, 1, 2] = self.auction_cards[ties, 1]
+        self.stacks[ties] -= self.bids[ties]
+        wins = settled[~tie]
+        winners = np.argmax(settled_bids[~tie], axis=1)
+        self.hole[wins, winners, 2] = self.auction_cards[wins, 0]
+        self.stacks[wins, winners] -= self.bids[wins, 1 - winners]
+        self.button[settled] = 1
+        self.auction[settled] = False
+
+        self.proceed_street(np.concatenate([calls, idx[street_over]]))
+
+
+def simulate(policies, batch_size, seed=None):
+    '''
+    Plays batch_size hands between two policies. The policies swap seats every hand
+    like the engine's players, starting with policies[0] in seat 0 (the small blind).
+    Returns a SimulationResult whose deltas (batch, 2) are indexed by policy.
+    '''
+    rng = np.random.default_rng(seed)
+    state = BatchRoundState(*deal(batch_size, rng))
+    seats = np.arange(batch_size) % 2  # seat of policies[0] in every hand
+    while not state.done.all():
+        live = np.flatnonzero(~state.done)
+        active = state.button[live] % 2
+        acting = []
+        for p, policy in enumerate(policies):
+            idx = live[active == (seats[live] ^ p)]
+            if len(idx) > 0:
+                view = state.view(idx)
+                codes, amounts = state.enforce(view, *policy(view))
+                acting.append((idx, codes, amounts))
+        # the policies act in disjoint hands, so both moves can be applied together
+        state.proceed(np.concatenate([a[0] for a in acting]), np.concatenate([a[1] for a in acting]),
+                      np.concatenate([a[2] for a in acting]))
+    deltas = np.column_stack([np.where(seats == 0, state.deltas, -state.deltas),
+                              np.where(seats == 0, -state.deltas, state.deltas)])
+    return SimulationResult(deltas, seats, state.street, state.showdown, state.bids)
+
+
+def all_in(view):
+    '''
+    Mirrors allinbot: bids half its stack, shoves when it can raise, otherwise checks or folds.
+    '''
+    shove = np.where(view.opp_stack < view.my_stack, view.opp_stack, view.my_stack)
+    codes = np.where(view.auction, BID, np.where(view.can_raise, RAISE, np.where(view.can_check, CHECK, FOLD)))
+    amounts = np.where(view.auction, view.my_stack // 2, shove)
+    return codes, amounts
+
+
+def check_fold(view):
+    '''
+    Never puts in another chip: bids 0, checks when possible and folds otherwise.
+    '''
+    return np.where(view.auction, BID, np.where(view.can_check, CHECK, FOLD)), np.zeros_like(view.my_stack)
+
+
+def check_call(view):
+    '''
+    Bids 0 and checks or calls everything.
+    '''
+    return np.where(view.auction, BID, np.where(view.can_check, CHECK, CALL)), np.zeros_like(view.my_stack)
+
+
+def threshold_bid(min_rank_sum, bid, fold_below=0):
+    '''
+    Returns a policy that bids a fixed amount when the ranks of its hole cards sum to at
+    least min_rank_sum (2 is rank 0, ace is 12), folds to any bet with a rank sum below
+    fold_below and otherwise checks or calls.
+    '''
+    def policy(view):
+        rank_sum = (view.hole[:, 0] >> 2) + (view.hole[:, 1] >> 2)
+        weak = rank_sum < fold_below
+        betting = np.where(view.can_check, CHECK, np.where(weak, FOLD, CALL))
+        codes = np.where(view.auction, BID, betting)
+        amounts = np.where(rank_sum >= min_rank_sum, np.minimum(bid, view.max_bid), 0)
+        return codes, amounts
+    return policy
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python3 simulator.py')
+    parser.add_argument('--hands', type=int, default=100000, help='Number of hands to simulate')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the deal stream')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    policies = {'all_in': all_in, 'check_fold': check_fold, 'check_call': check_call,
+                'threshold_bid': threshold_bid(18, 40, fold_below=10)}
+    names = list(policies)
+    for i, first in enumerate(names):
+        for second in names[i + 1:]:
+            start_time = time.perf_counter()
+            result = simulate([policies[first], policies[second]], args.hands, args.seed)
+            elapsed = time.perf_counter() - start_time
+            deltas = result.deltas[:, 0]
+            print('{} vs {}: {:+.3f} +- {:.3f} per hand ({:.0f} hands/s)'.format(
+                first, second, deltas.mean(), deltas.std() / np.sqrt(len(deltas)), len(deltas) / elapsed))
@@ -0,0 +1,115 @@
+'''
+Runs many independent engine matches between two pokerbots across a process pool
+and summarizes the final bankrolls.
+'''
+from contextlib import redirect_stdout
+from multiprocessing import Pool, util
+from statistics import NormalDist
+import argparse
+import random
+import json
+import math
+import os
+
+from engine import Game, Player, PlayerPool, InProcessPlayer
+from config import *
+
+# pokerbots kept running by this worker process between matches, see start_worker
+WORKER_POOL = None
+
+
+def start_worker(headless):
+    '''
+    Gives a worker process a pool of pokerbots that stay alive across its matches.
+    '''
+    global WORKER_POOL
+    WORKER_POOL = PlayerPool(InProcessPlayer if headless else Player)
+    # stop the pokerbots when the worker exits
+    util.Finalize(None, WORKER_POOL.close, exitpriority=10)
+
+
+def run_match(match):
+    '''
+    Runs one match in a worker process. Each match gets its own seed and log directory,
+    and every bot subprocess binds its own ephemeral port. With --persistent the
+    worker's pokerbots are reused instead of started for every match.
+    '''
+    index, seed, player_1, player_2, num_rounds, log_dir, headless, duplicate = match
+    os.makedirs(log_dir, exist_ok=True)
+    random.seed(seed)  # also fixes the randomness of headless pokerbots
+    with open(os.path.join(log_dir, 'engine.txt'), 'w') as engine_output:
+        with redirect_stdout(engine_output):
+            bankrolls = Game(player_1, player_2, num_rounds, log_dir, headless, seed, duplicate, WORKER_POOL).run()
+    return index, seed, bankrolls[player_1[0]]
+
+
+def summarize(results, num_rounds, confidence):
+    '''
+    Computes the mean, standard error and a normal confidence interval of player 1's final bankroll.
+    '''
+    bankrolls = [bankroll for _, _, bankroll in results]
+    n = len(bankrolls)
+    mean = sum(bankrolls) / n
+    variance = sum((bankroll - mean) ** 2 for bankroll in bankrolls) / (n - 1) if n > 1 else float('nan')
+    std_error = math.sqrt(variance / n)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    return {
+        'matches': n,
+        'rounds_per_match': num_rounds,
+        'mean': mean,
+        'std_error': std_error,
+        'confidence': confidence,
+        'interval': [mean - z * std_error, mean + z * std_error],
+        'mean_per_round': mean / num_rounds,
+        'bankrolls': bankrolls,
+    }
+
+
+def parse_args():
+    '''
+    Parses the tournament configuration. Defaults come from config.py.
+    '''
+    parser = argparse.ArgumentParser(prog='python3 tournament.py')
+    parser.add_argument('--player-1', type=str, default=PLAYER_1_PATH, help='Path to the first pokerbot')
+    parser.add_argument('--player-2', type=str, default=PLAYER_2_PATH, help='Path to the second pokerbot')
+    parser.add_argument('--matches', type=int, default=os.cpu_count(), help='Number of independent matches')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of worker processes')
+    parser.add_argument('--rounds', type=int, default=NUM_ROUNDS, help='Rounds per match')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the first match; match i uses seed + i')
+    parser.add_argument('--confidence', type=float, default=0.95, help='Confidence level of the interval')
+    parser.add_argument('--headless', action='store_true', default=HEADLESS, help='Run bots inside the engine processes')
+    parser.add_argument('--duplicate', action='store_true', default=DUPLICATE, help='Replay every deal with the seats swapped')
+    parser.add_argument('--persistent', action='store_true', help='Keep pokerbots running between the matches of a worker')
+    parser.add_argument('--out', type=str, default='tournament', help='Directory for match logs and the summary')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    player_1 = (PLAYER_1_NAME, args.player_1)
+    player_2 = (PLAYER_2_NAME, args.player_2)
+    matches = [(i, args.seed + i, player_1, player_2, args.rounds,
+                os.path.join(args.out, 'match_{:04d}'.format(i)), args.headless, args.duplicate)
+               for i in range(args.matches)]
+    results = []
+    initializer = start_worker if args.persistent else None
+    with Pool(args.workers, initializer, (args.headless,)) as pool:
+        for index, seed, bankroll in pool.imap_unordered(run_match, matches):
+            results.append((index, seed, bankroll))
+            print('Match {} (seed {}): {} {}'.format(index, seed, PLAYER_1_NAME, bankroll))
+    results.sort()
+    summary = summarize(results, args.rounds, args.confidence)
+    summary['player_1'] = args.player_1
+    summary['player_2'] = args.player_2
+    summary['duplicate'] = args.duplicate
+    print('{} vs {} over {} matches of {} rounds'.format(args.player_1, args.player_2, summary['matches'], args.rounds))
+    print('Mean {:.1f}, standard error {:.1f}, {:.0%} interval [{:.1f}, {:.1f}]'.format(
+        summary['mean'], summary['std_error'], args.confidence, *summary['interval']))
+    name = os.path.join(args.out, 'summary.json')
+    print('Writing', name)
+    with open(name, 'w') as summary_file:
+        json.dump(summary, summary_file, indent=4)
+
+
+if __name__ == '__main__':
+    main()